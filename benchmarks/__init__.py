@@ -0,0 +1,7 @@
+"""
+Micro-benchmarks of the hot paths, run from the repo root:
+
+    python -m benchmarks.event_loop_latency
+
+They run against a throwaway sqlite database unless DB_CONNECTION is set.
+"""
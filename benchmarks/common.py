@@ -0,0 +1,51 @@
+import os
+import tempfile
+from time import perf_counter
+
+
+def setup_environment():
+    """
+    Point the app at a fresh sqlite file with test secrets, must run before
+    anything imports database.
+    """
+    if 'DB_CONNECTION' not in os.environ:
+        os.environ['DB_CONNECTION'] = 'sqlite'
+        os.environ['DB_NAME'] = os.path.join(
+            tempfile.mkdtemp(prefix='codeglimpse-bench-'), 'bench.db'
+        )
+    os.environ.setdefault('ACCESS_TOKEN_SECRET', 'benchmark-secret')
+    os.environ.setdefault('REFRESH_TOKEN_SECRET', 'benchmark-refresh-secret')
+    os.environ.setdefault('ALGORITHM', 'HS256')
+    os.environ.setdefault('ACCESS_TOKEN_EXPIRE_MINUTES', '15')
+    os.environ.setdefault('REFRESH_TOKEN_EXPIRE_MINUTES', '1200')
+
+
+def create_schema():
+    from database import Base, engine
+    import models.Counter  # noqa: F401
+    import models.ReviewCache  # noqa: F401
+    import models.Snippet  # noqa: F401
+    import models.Tag  # noqa: F401
+    import models.User  # noqa: F401
+
+    Base.metadata.create_all(engine)
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def report(name, samples):
+    """Print p50/p99 of the samples (seconds) in microseconds."""
+    print(
+        f'{name:<40} n={len(samples):<7} '
+        f'p50={percentile(samples, 50) * 1e6:9.1f}us '
+        f'p99={percentile(samples, 99) * 1e6:9.1f}us'
+    )
+
+
+def timed(func, *args):
+    start = perf_counter()
+    func(*args)
+    return perf_counter() - start
@@ -0,0 +1,101 @@
+"""
+p50/p99 of /data/languages on its own and while concurrent authenticated
+clients hammer /snippets/my, through the app in a single event loop. A
+dependency blocking the loop (a sync user lookup) shows up as the loaded
+p99 climbing far above the idle one, the clients share the loop too so a
+few times higher is just scheduling. The user cache is cleared before every
+/snippets/my so each of them resolves its user from the database. With a
+max ratio it exits non zero when the loaded p99 is more than that many
+times the idle p99:
+
+    python -m benchmarks.event_loop_latency [seconds] [clients] [max p99 ratio]
+"""
+import asyncio
+import sys
+from time import perf_counter
+
+from benchmarks.common import create_schema, percentile, report, setup_environment
+
+setup_environment()
+
+import httpx  # noqa: E402
+
+from database import session_scope  # noqa: E402
+from main import app  # noqa: E402
+from middlewares import user_cache  # noqa: E402
+from models.Snippet import Snippet  # noqa: E402
+from models.User import User  # noqa: E402
+from utils import UID, Auth  # noqa: E402
+
+EMAIL = 'bench@example.com'
+
+
+async def seed():
+    create_schema()
+    async with session_scope() as db:
+        user = User(name='Bench', username='bench', email=EMAIL, google_auth=1)
+        db.add(user)
+        await db.flush()
+        db.add_all([
+            Snippet(
+                uid=UID.generate(),
+                title=f'snippet {i}',
+                source_code=f'print({i})',
+                language='py',
+                visibility=1,
+                user_id=user.id,
+            )
+            for i in range(50)
+        ])
+        await db.commit()
+
+
+async def probe(client, seconds):
+    samples = []
+    deadline = perf_counter() + seconds
+    while perf_counter() < deadline:
+        start = perf_counter()
+        response = await client.get('/api/v1/data/languages')
+        samples.append(perf_counter() - start)
+        assert response.status_code == 200
+        # a client polling, not a second hammer
+        await asyncio.sleep(0.001)
+    return samples
+
+
+async def hammer(client, headers, stop):
+    requests = 0
+    while not stop.is_set():
+        user_cache.clear()
+        response = await client.get('/api/v1/snippets/my?limit=10', headers=headers)
+        assert response.status_code == 200, response.text
+        requests += 1
+    return requests
+
+
+async def main(seconds, clients):
+    await seed()
+    headers = {'Authorization': f"Bearer {Auth.create_access_token(data={'sub': EMAIL})}"}
+
+    async with httpx.AsyncClient(app=app, base_url='http://bench') as client:
+        idle = await probe(client, seconds)
+        report('/data/languages, idle', idle)
+
+        stop = asyncio.Event()
+        hammers = [asyncio.create_task(hammer(client, headers, stop)) for _ in range(clients)]
+        loaded = await probe(client, seconds)
+        stop.set()
+        served = sum(await asyncio.gather(*hammers))
+        report(f'/data/languages, {clients} clients on /my', loaded)
+        print(f'/snippets/my served {served / seconds:.0f} req/s meanwhile')
+
+    return percentile(loaded, 99) / percentile(idle, 99)
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    ratio = asyncio.run(main(seconds, clients))
+    print(f'loaded/idle p99: {ratio:.1f}x')
+    if len(sys.argv) > 3 and ratio > float(sys.argv[3]):
+        sys.exit(f'p99 under load is {ratio:.1f}x the idle one, over {sys.argv[3]}x')
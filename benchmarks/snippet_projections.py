@@ -0,0 +1,121 @@
+"""
+Per endpoint snippet projections against the serialize() + del path they
+replaced, in microseconds per snippet:
+
+    python -m benchmarks.snippet_projections [iterations]
+"""
+import sys
+import timeit
+from collections import namedtuple
+from datetime import datetime
+
+from benchmarks.common import setup_environment
+
+setup_environment()
+
+from lib.registry import get_language  # noqa: E402
+from models.Snippet import (  # noqa: E402
+    PREVIEW_LENGTH,
+    Snippet,
+    export_columns,
+    export_item,
+    list_columns,
+    list_item,
+)
+from models.User import User  # noqa: E402
+
+SOURCE = 'def main():\n    print("hello")\n' * 20
+
+
+def make_snippet(visibility=1):
+    return Snippet(
+        id=1,
+        uid='0AbCdEfGhI',
+        title='hello world',
+        source_code=SOURCE,
+        language='py',
+        tags='python,hello',
+        visibility=visibility,
+        pass_code='abc123' if visibility == 2 else None,
+        theme='monokai',
+        user_id=1,
+        created_at=datetime(2023, 5, 1, 12, 0),
+        updated_at=datetime(2023, 5, 2, 12, 0),
+        user=User(id=1, name='Owner', username='owner', email='owner@example.com'),
+    )
+
+
+def make_row(columns, snippet):
+    # what the listing queries return: plain named rows of those columns
+    names = [column.key if hasattr(column, 'key') else column.name for column in columns]
+    Row = namedtuple('Row', names)
+    values = {name: getattr(snippet, name, None) for name in names}
+    if 'owner' in values:
+        values['owner'] = snippet.user.name
+    if 'preview' in values:
+        values['preview'] = snippet.source_code[:PREVIEW_LENGTH]
+    return Row(**values)
+
+
+# the paths before the projections
+def detail_by_serialize(snippet):
+    _snippet = snippet.serialize()
+    del _snippet['id']
+    del _snippet['visibility']
+    del _snippet['updated_at']
+    _snippet['mode'] = get_language(_snippet['_lang'])['mode']
+    del _snippet['_lang']
+    return _snippet
+
+
+def edit_by_serialize(snippet):
+    _snippet = snippet.serialize()
+    del _snippet['id']
+    del _snippet['created_at']
+    del _snippet['updated_at']
+    del _snippet['owner']
+    _snippet['mode'] = get_language(_snippet['_lang'])['mode']
+    _snippet['language'] = _snippet['_lang']
+    del _snippet['_lang']
+    return _snippet
+
+
+def list_by_serialize(snippet):
+    _snippet = snippet.serialize()
+    _snippet['source_code'] = _snippet['source_code'][:PREVIEW_LENGTH]
+    del _snippet['id']
+    del _snippet['visibility']
+    del _snippet['updated_at']
+    _snippet['mode'] = get_language(_snippet['_lang'])['mode']
+    del _snippet['_lang']
+    return _snippet
+
+
+def measure(func, arg, iterations):
+    return min(timeit.repeat(lambda: func(arg), number=iterations, repeat=5)) / iterations * 1e6
+
+
+def compare(name, old, new, old_arg, new_arg, iterations):
+    before = measure(old, old_arg, iterations)
+    after = measure(new, new_arg, iterations)
+    print(f'{name:<10} serialize+del {before:7.2f}us  projection {after:7.2f}us  {before / after:5.2f}x')
+
+
+def main(iterations):
+    public = make_snippet()
+    private = make_snippet(visibility=2)
+
+    compare('detail', detail_by_serialize, Snippet.to_detail, public, public, iterations)
+    compare('edit', edit_by_serialize, Snippet.to_edit, private, private, iterations)
+    compare(
+        'list', list_by_serialize, list_item,
+        public, make_row(list_columns, public), iterations
+    )
+    compare(
+        'export', Snippet.serialize, export_item,
+        public, make_row(export_columns, public), iterations
+    )
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
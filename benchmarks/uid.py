@@ -0,0 +1,50 @@
+"""
+Throughput of UID.generate, in one thread and spread over several:
+
+    python -m benchmarks.uid [ids] [threads]
+"""
+import sys
+import threading
+from time import perf_counter
+
+from utils import UID
+
+
+def single(count):
+    start = perf_counter()
+    for _ in range(count):
+        UID.generate()
+    return perf_counter() - start
+
+
+def threaded(count, threads):
+    per_thread = count // threads
+
+    def generate():
+        for _ in range(per_thread):
+            UID.generate()
+
+    workers = [threading.Thread(target=generate) for _ in range(threads)]
+    start = perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return perf_counter() - start
+
+
+def main(count, threads):
+    # the sequence allows 256 ids per millisecond and worker, past that
+    # generate waits for the next millisecond
+    elapsed = single(count)
+    print(f'1 thread   {count / elapsed:12,.0f} ids/s')
+    elapsed = threaded(count, threads)
+    print(f'{threads} threads  {count / elapsed:12,.0f} ids/s')
+    print(f'ceiling    {(1 << UID.SEQUENCE_BITS) * 1000:12,} ids/s per worker id')
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+    )
@@ -1,9 +1,22 @@
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+from itertools import count
 from os import environ
+from time import monotonic
+
+import anyio
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import CursorResult, FrozenResult
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session as SyncSession, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from utils.Cache import TTLCache
 
 load_dotenv()
 
@@ -13,14 +26,346 @@ db_port = environ.get('DB_PORT')
 db_name = environ.get('DB_NAME')
 db_user = environ.get('DB_USERNAME')
 db_password = environ.get('DB_PASSWORD')
-db_connector = 'mysql+mysqlconnector' if db_connection == 'mysql' else 'postgresql'
 
-connection_string = f"{db_connector}://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+# DB_CONNECTION picks the driver, the *_async ones run on an AsyncEngine
+connectors = {
+    'mysql': 'mysql+mysqlconnector',
+    'mysql_async': 'mysql+' + environ.get('DB_MYSQL_ASYNC_DRIVER', 'aiomysql'),
+    'pgsql': 'postgresql',
+    'pgsql_async': 'postgresql+asyncpg',
+    'sqlite': 'sqlite',
+}
+db_connector = connectors.get(db_connection, 'postgresql')
+db_async = db_connection in ('mysql_async', 'pgsql_async')
+
+
+def make_connection_string(host, port):
+    if db_connection == 'sqlite':
+        return f"sqlite:///{db_name}"
+    return f"{db_connector}://{db_user}:{db_password}@{host}:{port}/{db_name}"
+
+
+connection_string = make_connection_string(db_host, db_port)
 # print(connection_string)
 
-engine = create_engine(connection_string, echo=False)
+# read replicas as host or host:port, same credentials and database as the
+# primary. empty means everything goes to the primary
+replica_hosts = [
+    host.strip()
+    for host in environ.get('DB_REPLICA_HOSTS', '').split(',')
+    if host.strip() and db_connection != 'sqlite'
+]
+
+# connection pool settings, tune these per deployment through the env
+pool_options = {
+    'pool_size': int(environ.get('DB_POOL_SIZE', 10)),
+    'max_overflow': int(environ.get('DB_POOL_MAX_OVERFLOW', 20)),
+    'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),
+    'pool_timeout': int(environ.get('DB_POOL_TIMEOUT', 30)),
+    'pool_pre_ping': environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+}
+
+# threads allowed to block on the sync drivers at once, kept apart from the
+# default anyio threadpool so DB calls can't starve the other sync work and
+# sized to the pool since extra threads would only wait for a connection
+db_thread_limit = int(environ.get(
+    'DB_THREAD_LIMIT',
+    pool_options['pool_size'] + pool_options['max_overflow']
+))
+
+# seconds a user keeps reading from the primary after one of their writes,
+# long enough to cover the replication lag
+sticky_seconds = int(environ.get('DB_STICKY_SECONDS', 5))
+# seconds a replica that failed is skipped, and between health checks
+replica_retry_after = int(environ.get('DB_REPLICA_RETRY_AFTER', 30))
+replica_check_interval = int(environ.get('DB_REPLICA_CHECK_INTERVAL', 10))
+
+
+def make_engine(url):
+    # the sync engine the sessions bind to, and the async one in async mode
+    if db_async:
+        async_engine = create_async_engine(url, echo=False, **pool_options)
+        return async_engine.sync_engine, async_engine
+    return create_engine(
+        url, echo=False, poolclass=QueuePool, **pool_options
+    ), None
+
+
+class ReplicaSet:
+    """
+    Read replicas handed out round-robin. A replica whose connections fail
+    or that misses a health check is skipped for DB_REPLICA_RETRY_AFTER
+    seconds, with every replica down the reads fall back to the primary.
+    """
+
+    def __init__(self, hosts):
+        self.engines = []
+        self.async_engines = {}
+        self.down_until = {}
+        self.turn = count()
+        self.checker = None
+
+        for host in hosts:
+            host, _, port = host.partition(':')
+            replica, async_replica = make_engine(
+                make_connection_string(host, port or db_port)
+            )
+            event.listen(replica, 'handle_error', self.on_error)
+            self.engines.append(replica)
+            self.async_engines[replica] = async_replica
+
+    def __bool__(self):
+        return bool(self.engines)
+
+    def pick(self):
+        now = monotonic()
+        for _ in range(len(self.engines)):
+            replica = self.engines[next(self.turn) % len(self.engines)]
+            if self.down_until.get(replica, 0) <= now:
+                return replica
+        return None
+
+    def mark_down(self, replica):
+        self.down_until[replica] = monotonic() + replica_retry_after
+
+    def on_error(self, context):
+        # connect failures come without a connection
+        if context.is_disconnect or context.connection is None:
+            self.mark_down(context.engine)
+
+    @staticmethod
+    def ping_sync(replica):
+        with replica.connect() as connection:
+            connection.execute(text('SELECT 1'))
+
+    async def ping(self, replica):
+        async_replica = self.async_engines[replica]
+        if async_replica is None:
+            await ThreadedSession.run(self.ping_sync, replica)
+        else:
+            async with async_replica.connect() as connection:
+                await connection.execute(text('SELECT 1'))
+
+    async def check(self):
+        while True:
+            for replica in self.engines:
+                try:
+                    await asyncio.wait_for(
+                        self.ping(replica), pool_options['pool_timeout']
+                    )
+                    self.down_until.pop(replica, None)
+                except Exception:
+                    self.mark_down(replica)
+            await asyncio.sleep(replica_check_interval)
+
+    async def start(self):
+        if self.engines and self.checker is None:
+            self.checker = asyncio.create_task(self.check())
+
+    async def stop(self):
+        if self.checker is not None:
+            self.checker.cancel()
+            self.checker = None
+
+
+engine, async_engine = make_engine(connection_string)
+replicas = ReplicaSet(replica_hosts)
+
+# user key (token subject) -> True while the user is sticky to the primary
+sticky_users = TTLCache(
+    maxsize=int(environ.get('DB_STICKY_USERS_SIZE', 100000)),
+    ttl=sticky_seconds
+)
+
+
+def is_read(clause):
+    return (
+        clause is not None
+        and getattr(clause, 'is_select', False)
+        and getattr(clause, '_for_update_arg', None) is None
+    )
+
+
+class RoutingSession(SyncSession):
+    """
+    Sends plain SELECTs to a replica and everything else to the primary.
+    Once the session writes, or when it is pinned with use_primary, the
+    rest of it reads from the primary too so it sees its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or getattr(clause, 'is_dml', False):
+            self.info['wrote'] = True
+            self.info['primary'] = True
+        elif replicas and not self.info.get('primary') and is_read(clause):
+            # one replica per session, its reads see a single snapshot
+            replica = self.info.get('replica') or replicas.pick()
+            if replica is not None:
+                self.info['replica'] = replica
+                return replica
+
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def stick_to_primary(session):
+    user = session.info.get('user')
+    if session.info.pop('wrote', False) and user is not None:
+        sticky_users.set(user, True)
+
 
-Session = sessionmaker(bind=engine)
-db = Session()
+def use_primary(db):
+    """Pin a session to the primary, for reads that must see the latest writes."""
+    db.info['primary'] = True
+
+
+def bind_user(db, user):
+    """
+    Tie a session to the user it works for, their writes make them sticky
+    to the primary and the session is pinned while they still are.
+    """
+    db.info['user'] = user
+    if sticky_users.get(user):
+        use_primary(db)
+
+
+if db_async:
+    AsyncSession = async_sessionmaker(
+        async_engine, expire_on_commit=False, sync_session_class=RoutingSession
+    )
+else:
+    AsyncSession = None
+
+Session = sessionmaker(bind=engine, class_=RoutingSession)
 
 Base = declarative_base()
+
+
+class ThreadedSession:
+    """
+    Awaitable facade over a sync Session with the same surface as
+    AsyncSession, every call that hits the database runs in a worker thread
+    bounded by DB_THREAD_LIMIT. Used when DB_CONNECTION points to a sync
+    driver.
+    """
+
+    limiter = None
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    @property
+    def info(self):
+        return self.sync_session.info
+
+    @classmethod
+    def run(cls, func, *args, **kwargs):
+        # the limiter has to be created inside the running event loop
+        if cls.limiter is None:
+            cls.limiter = anyio.CapacityLimiter(db_thread_limit)
+        return anyio.to_thread.run_sync(
+            partial(func, *args, **kwargs), limiter=cls.limiter
+        )
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kwargs):
+        # rows are fetched inside the thread so the loop never touches the cursor,
+        # a statement without rows (insert, update) has its cursor closed already
+        def execute():
+            result = self.sync_session.execute(statement, params, **kwargs)
+            if isinstance(result, CursorResult) and not result.returns_rows:
+                return result
+            return result.freeze()
+
+        result = await self.run(execute)
+        return result() if isinstance(result, FrozenResult) else result
+
+    async def stream(self, statement, params=None, **kwargs):
+        # server side cursor, read partition by partition in the DB threads
+        result = await self.run(
+            self.sync_session.execute,
+            statement,
+            params,
+            execution_options={'stream_results': True},
+            **kwargs
+        )
+        return ThreadedResult(result)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        result = await self.execute(statement, params, **kwargs)
+        return result.scalar()
+
+    async def scalars(self, statement, params=None, **kwargs):
+        result = await self.execute(statement, params, **kwargs)
+        return result.scalars()
+
+    async def get(self, entity, ident, **kwargs):
+        return await self.run(
+            self.sync_session.get, entity, ident, **kwargs
+        )
+
+    async def delete(self, instance):
+        await self.run(self.sync_session.delete, instance)
+
+    async def flush(self, objects=None):
+        await self.run(self.sync_session.flush, objects)
+
+    async def refresh(self, instance, attribute_names=None):
+        await self.run(
+            self.sync_session.refresh, instance, attribute_names
+        )
+
+    async def commit(self):
+        await self.run(self.sync_session.commit)
+
+    async def rollback(self):
+        await self.run(self.sync_session.rollback)
+
+    async def close(self):
+        await self.run(self.sync_session.close)
+
+
+class ThreadedResult:
+    """Streamed result of a ThreadedSession, the AsyncResult calls it needs."""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size=None):
+        partitions = self.result.partitions(size)
+        while True:
+            partition = await ThreadedSession.run(next, partitions, None)
+            if partition is None:
+                break
+            yield partition
+
+    async def close(self):
+        await ThreadedSession.run(self.result.close)
+
+
+# per request session for async handlers: db=Depends(get_async_db)
+# yields an AsyncSession in async mode, a ThreadedSession otherwise. requests
+# that may write (and the validators loading the rows they change) run on the
+# primary, GET/HEAD read from the replicas
+async def get_async_db(request: Request = None):
+    if db_async:
+        db = AsyncSession()
+    else:
+        db = ThreadedSession(Session(expire_on_commit=False))
+
+    if request is not None and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        use_primary(db)
+
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+# the same session outside of a request: async with session_scope() as db:
+session_scope = asynccontextmanager(get_async_db)
@@ -24,7 +24,7 @@ languages = [
   { 'ext': 'md', 'name': 'Markdown', 'mode': 'markdown' },
   { 'ext': 'm', 'name': 'MATLAB', 'mode': 'matlab' },
   { 'ext': 'nginx', 'name': 'Nginx', 'mode': 'nginx' },
-  { 'ext': 'm', 'name': 'Objective-C', 'mode': 'objectivec' },
+  { 'ext': 'mm', 'name': 'Objective-C', 'mode': 'objectivec' },
   { 'ext': 'pas', 'name': 'Pascal', 'mode': 'pascal' },
   { 'ext': 'pl', 'name': 'Perl', 'mode': 'perl' },
   { 'ext': 'php', 'name': 'PHP', 'mode': 'php' },
@@ -0,0 +1,37 @@
+from types import MappingProxyType
+
+from lib.data.languages import languages as language_list
+from lib.data.themes import themes as theme_list
+
+
+def build_index(items, key):
+    """
+    Read-only key -> item mapping, a duplicated key is a data error and
+    fails at import instead of making lookups ambiguous.
+    """
+    index = {}
+    for item in items:
+        value = item[key]
+        if value in index:
+            raise ValueError(
+                f"Duplicate {key} '{value}' in reference data: "
+                f"{index[value]['name']} and {item['name']}"
+            )
+        index[value] = MappingProxyType(dict(item))
+    return MappingProxyType(index)
+
+
+languages_by_ext = build_index(language_list, 'ext')
+themes_by_value = build_index(theme_list, 'value')
+
+# plain copies in the original order, for serializing
+languages = tuple(dict(language) for language in languages_by_ext.values())
+themes = tuple(dict(theme) for theme in themes_by_value.values())
+
+
+def get_language(ext):
+    return languages_by_ext.get(ext)
+
+
+def get_theme(value):
+    return themes_by_value.get(value)
@@ -1,16 +1,44 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 # from database import Base, engine
+from database import replicas
 from routers import snippets, users, data
+from services import (
+    code_review_service,
+    search_service,
+    snippet_cache,
+    static_review_service,
+)
+from services.review_jobs import job_queue
+from utils.Compression import CompressionMiddleware
 
 # from routers import data, snippets
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    await replicas.start()
+    await search_service.start()
+    await code_review_service.start()
+    await job_queue.start()
+    await snippet_cache.start()
+    yield
+    await snippet_cache.stop()
+    await job_queue.stop()
+    await code_review_service.stop()
+    static_review_service.shutdown()
+    await replicas.stop()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 # Base.metadata.create_all(engine)
 
+app.add_middleware(CompressionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,7 +60,7 @@ async def validation_exception_handler(request, exc):
             status_code = 415
             error_messages[error['loc'][0]] = error['msg']
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status_code,
         content=jsonable_encoder({'detail': error_messages}),
     )
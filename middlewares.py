@@ -1,54 +1,33 @@
+from os import environ
 from typing import Annotated
 
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
+from sqlalchemy import select
 
-from database import db
+from database import bind_user, get_async_db
 from models.User import User
 from utils import Auth
-
-
-async def get_current_user(request: Request):
-    token_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail='Unauthorized',
-        headers={'WWW-Authenticate': 'Bearer'},
-    )
-
+from utils.Cache import TTLCache
+
+# token subject (email) -> user dict, saves the user lookup on most requests.
+# an entry outlives a deleted, renamed or demoted user by up to USER_CACHE_TTL,
+# every path that changes or deletes a user must user_cache.invalidate(email)
+# so the change applies on the next request
+user_cache = TTLCache(
+    maxsize=int(environ.get('USER_CACHE_SIZE', 10000)),
+    ttl=int(environ.get('USER_CACHE_TTL', 300))
+)
+
+
+# resolve the bearer token of a request to the user dict, None if it can't be
+# resolved. the lookup is awaited (AsyncSession or the bounded DB threads) so
+# it never blocks the event loop
+async def get_user_from_request(request: Request, db):
     token = request.headers.get('Authorization')
-    if token is None or not token.startswith('Bearer '):
-        raise token_exception
-
-    token = token.replace('Bearer ', '')
-
-    try:
-        payload = Auth.decode_access_token(token)
-        email = payload.get('sub')
-        if not email:
-            raise token_exception
-
-    except Exception as e:
-        raise token_exception
-
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise token_exception
 
-    user = {
-        'id': user.id,
-        'name': user.name,
-        'username': user.username,
-        'email': user.email
-    }
-
-    return user
-
-
-async def get_current_user2(request: Request):
-    token = request.headers.get('Authorization')
-    
     if token is None or not token.startswith('Bearer '):
         return None
 
@@ -63,7 +42,18 @@ async def get_current_user2(request: Request):
     except Exception as e:
         return None
 
-    _user = db.query(User).filter(User.email == email).first()
+    # reads right after this user's own writes go to the primary
+    bind_user(db, email)
+
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+
+    # only the columns we hand out, no need to build a full User entity
+    _user = (await db.execute(
+        select(User.id, User.name, User.username, User.email)
+        .where(User.email == email)
+    )).first()
     if not _user:
         return None
 
@@ -73,5 +63,24 @@ async def get_current_user2(request: Request):
         'username': _user.username,
         'email': _user.email
     }
+    user_cache.set(email, user)
 
     return user
+
+
+async def get_current_user(request: Request, db=Depends(get_async_db)):
+    token_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail='Unauthorized',
+        headers={'WWW-Authenticate': 'Bearer'},
+    )
+
+    user = await get_user_from_request(request, db)
+    if not user:
+        raise token_exception
+
+    return user
+
+
+async def get_current_user2(request: Request, db=Depends(get_async_db)):
+    return await get_user_from_request(request, db)
@@ -0,0 +1,19 @@
+"""
+Schema migrations for databases created before a model change, fresh
+databases get the full schema from Base.metadata.create_all.
+
+Each module in `names` exposes upgrade(connection) and runs once, applied
+names are recorded in the schema_migrations table. Run with:
+
+    python -m migrations
+"""
+
+names = [
+    'm001_snippet_search_index',
+    'm002_snippet_listing_indexes',
+    'm003_counters_table',
+    'm004_snippet_preview',
+    'm005_review_cache_table',
+    'm006_snippet_tags',
+    'm007_snippet_version',
+]
@@ -0,0 +1,43 @@
+import asyncio
+from importlib import import_module
+
+from sqlalchemy import TIMESTAMP, Column, MetaData, String, Table, func, select
+
+from database import async_engine, db_async, engine
+from migrations import names
+
+metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations',
+    metadata,
+    Column('name', String(100), primary_key=True),
+    Column('applied_at', TIMESTAMP, nullable=False, server_default=func.now()),
+)
+
+
+def run_all(connection):
+    metadata.create_all(connection)
+    applied = set(connection.scalars(select(schema_migrations.c.name)).all())
+
+    for name in names:
+        if name in applied:
+            continue
+
+        print(f'Migrating: {name}')
+        import_module(f'migrations.{name}').upgrade(connection)
+        connection.execute(schema_migrations.insert().values(name=name))
+        connection.commit()
+        print(f'Migrated:  {name}')
+
+
+async def run_all_async():
+    async with async_engine.connect() as connection:
+        await connection.run_sync(run_all)
+
+
+if __name__ == '__main__':
+    if db_async:
+        asyncio.run(run_all_async())
+    else:
+        with engine.connect() as connection:
+            run_all(connection)
@@ -0,0 +1,26 @@
+from sqlalchemy import inspect, text
+
+from models.Snippet import search_document
+
+
+def has_index(connection, name):
+    return any(
+        index['name'] == name
+        for index in inspect(connection).get_indexes('snippets')
+    )
+
+
+def upgrade(connection):
+    dialect = connection.dialect.name
+
+    if dialect == 'postgresql':
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_snippets_search "
+            f"ON snippets USING gin ({search_document})"
+        ))
+    elif dialect == 'mysql' and not has_index(connection, 'ft_snippets_title_tags'):
+        # no IF NOT EXISTS for indexes on mysql
+        connection.execute(text(
+            "ALTER TABLE snippets "
+            "ADD FULLTEXT INDEX ft_snippets_title_tags (title, tags)"
+        ))
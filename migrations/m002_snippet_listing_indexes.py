@@ -0,0 +1,11 @@
+from models.Snippet import Snippet
+
+
+def upgrade(connection):
+    # checkfirst, databases made by create_all already have them
+    for index in Snippet.__table__.indexes:
+        if index.name in (
+            'ix_snippets_visibility_created_at_id',
+            'ix_snippets_user_id_created_at_id',
+        ):
+            index.create(connection, checkfirst=True)
@@ -0,0 +1,28 @@
+from sqlalchemy import func, select, update
+
+from models.Counter import PUBLIC_SNIPPETS, Counter
+from models.Snippet import Snippet
+
+
+def upgrade(connection):
+    Counter.__table__.create(connection, checkfirst=True)
+
+    total = connection.scalar(
+        select(func.count())
+        .select_from(Snippet)
+        .where(Snippet.visibility == 1)
+    )
+    # creating the table seeds the row with 0, upsert it
+    exists = connection.scalar(
+        select(Counter.name).where(Counter.name == PUBLIC_SNIPPETS)
+    )
+    if exists is None:
+        connection.execute(
+            Counter.__table__.insert().values(name=PUBLIC_SNIPPETS, value=total)
+        )
+    else:
+        connection.execute(
+            update(Counter.__table__)
+            .where(Counter.name == PUBLIC_SNIPPETS)
+            .values(value=total)
+        )
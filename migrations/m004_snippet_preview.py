@@ -0,0 +1,20 @@
+from sqlalchemy import func, inspect, text, update
+
+from models.Snippet import PREVIEW_LENGTH, Snippet
+
+
+def upgrade(connection):
+    # create_all already made the column on newer databases
+    columns = {column['name'] for column in inspect(connection).get_columns('snippets')}
+    if 'preview' in columns:
+        return
+
+    connection.execute(text(
+        f"ALTER TABLE snippets "
+        f"ADD COLUMN preview VARCHAR({PREVIEW_LENGTH}) NOT NULL DEFAULT ''"
+    ))
+    connection.execute(
+        update(Snippet.__table__).values(
+            preview=func.substr(Snippet.source_code, 1, PREVIEW_LENGTH)
+        )
+    )
@@ -0,0 +1,5 @@
+from models.ReviewCache import ReviewCache
+
+
+def upgrade(connection):
+    ReviewCache.__table__.create(connection, checkfirst=True)
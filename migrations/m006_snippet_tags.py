@@ -0,0 +1,50 @@
+from sqlalchemy import select
+
+from models.Snippet import Snippet
+from models.Tag import Tag, snippet_tags
+from services.tag_service import insert_ignore, normalize
+
+batch_size = 1000
+
+
+def upgrade(connection):
+    Tag.__table__.create(connection, checkfirst=True)
+    snippet_tags.create(connection, checkfirst=True)
+
+    connection.commit()
+
+    # backfill from the comma joined tags, a batch of snippets at a time,
+    # each committed so a big table is not one long transaction and a rerun
+    # after a failure skips what insert ignore finds already linked
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(Snippet.id, Snippet.tags)
+            .where(Snippet.id > last_id, Snippet.tags.isnot(None))
+            .order_by(Snippet.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        snippets = [(row.id, normalize(row.tags)) for row in rows]
+        names = list({name: None for _, tags in snippets for name in tags})
+        if not names:
+            continue
+
+        connection.execute(
+            insert_ignore(Tag.__table__), [{'name': name} for name in names]
+        )
+        ids = dict(connection.execute(
+            select(Tag.name, Tag.id).where(Tag.name.in_(names))
+        ).all())
+        connection.execute(
+            insert_ignore(snippet_tags),
+            [
+                {'snippet_id': snippet_id, 'tag_id': ids[name]}
+                for snippet_id, tags in snippets
+                for name in tags
+            ]
+        )
+        connection.commit()
@@ -0,0 +1,12 @@
+from sqlalchemy import inspect, text
+
+
+def upgrade(connection):
+    # create_all already made the column on newer databases
+    columns = {column['name'] for column in inspect(connection).get_columns('snippets')}
+    if 'version' in columns:
+        return
+
+    connection.execute(text(
+        "ALTER TABLE snippets ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+    ))
@@ -0,0 +1,19 @@
+from sqlalchemy import BigInteger, Column, String, event
+
+from database import Base
+
+# exact number of public snippets, kept up to date by the write paths
+PUBLIC_SNIPPETS = 'public_snippets'
+
+
+class Counter(Base):
+    __tablename__ = 'counters'
+    name = Column(String(50), primary_key=True)
+    value = Column(BigInteger, nullable=False, server_default='0')
+
+
+@event.listens_for(Counter.__table__, 'after_create')
+def seed_counters(table, connection, **kwargs):
+    # the row exists as long as the table does, an adjustment never finds it
+    # missing. m003 sets it to the real count on an existing database
+    connection.execute(table.insert().values(name=PUBLIC_SNIPPETS, value=0))
@@ -0,0 +1,11 @@
+from sqlalchemy import TIMESTAMP, Column, String, Text
+
+from database import Base
+
+
+class ReviewCache(Base):
+    __tablename__ = 'review_cache'
+    key = Column(String(64), primary_key=True)
+    message = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP, nullable=False, index=True)
+    expires_at = Column(TIMESTAMP, nullable=False)
@@ -1,17 +1,19 @@
-from sqlalchemy import (TIMESTAMP, Column, Enum, ForeignKey, Integer,
-                        SmallInteger, String, Text, func)
-from sqlalchemy.orm import relationship
+from sqlalchemy import (TIMESTAMP, Column, Enum, ForeignKey, Index, Integer,
+                        SmallInteger, String, Text, func, literal_column, text)
+from sqlalchemy.orm import deferred, relationship, validates
 
-from database import Base, db
+from database import Base
 from models.User import User
-from lib.data.languages import languages
+from lib.registry import get_language
 
 
-def get_language(ext):
-    for lang in languages:
-        if lang['ext'] == ext:
-            return lang
-    return None
+# listings show the first PREVIEW_LENGTH chars of the source, stored apart
+# so they never have to load the full source_code
+PREVIEW_LENGTH = 200
+
+# full-text document of a snippet on postgres, the GIN index below and the
+# search queries must use the exact same expression
+search_document = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(tags, ''))"
 
 
 class Snippet(Base):
@@ -19,7 +21,8 @@ class Snippet(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     uid = Column(String(50), unique=True, nullable=False)
     title = Column(String(50), nullable=False)
-    source_code = Column(Text, nullable=False)
+    source_code = deferred(Column(Text, nullable=False))
+    preview = Column(String(PREVIEW_LENGTH), nullable=False, server_default='')
     language = Column(String(10), nullable=False)
     tags = Column(String(255), nullable=True)
     visibility = Column(SmallInteger, nullable=False)
@@ -35,10 +38,51 @@ class Snippet(Base):
         server_onupdate=func.now()
     )
     deleted_at = Column(TIMESTAMP, nullable=True)
+    # bumped by every update, tells apart two edits within the same second
+    # of updated_at
+    version = Column(
+        Integer,
+        nullable=False,
+        server_default='1',
+        onupdate=literal_column('version + 1')
+    )
 
     user = relationship('User', back_populates='snippets')
 
-    def serialize(self):
+    __table_args__ = (
+        # keyset pagination of the public listing and of a user's library
+        Index(
+            'ix_snippets_visibility_created_at_id',
+            'visibility',
+            'created_at',
+            'id'
+        ),
+        Index(
+            'ix_snippets_user_id_created_at_id',
+            'user_id',
+            'created_at',
+            'id'
+        ),
+        Index(
+            'ix_snippets_search',
+            text(search_document),
+            postgresql_using='gin'
+        ).ddl_if(dialect='postgresql'),
+        Index(
+            'ft_snippets_title_tags',
+            'title',
+            'tags',
+            mysql_prefix='FULLTEXT'
+        ).ddl_if(dialect='mysql'),
+    )
+
+    @validates('source_code')
+    def validate_source_code(self, key, source_code):
+        self.preview = source_code[:PREVIEW_LENGTH]
+        return source_code
+
+    # pass owner when the query already selected users.name with the row
+    def serialize(self, owner=None):
         _snippet = {
             'id': self.id,
             'uid': self.uid,
@@ -48,7 +92,7 @@ class Snippet(Base):
             'language': get_language(self.language)['name'],
             'visibility': self.visibility,
             'theme': self.theme,
-            'owner': self.user.name,
+            'owner': owner if owner is not None else self.user.name,
 
         }
 
@@ -61,3 +105,146 @@ class Snippet(Base):
         _snippet['created_at'] = str(self.created_at)
         _snippet['updated_at'] = str(self.updated_at)
         return _snippet
+
+    # per endpoint projections, each builds just the fields its endpoint
+    # returns in one pass instead of serialize() and deleting keys
+
+    # show / show_private_snippet
+    def to_detail(self):
+        language = get_language(self.language)
+        _snippet = {
+            'uid': self.uid,
+            'title': self.title,
+            'source_code': self.source_code,
+            'language': language['name'],
+            'theme': self.theme,
+            'owner': self.user.name,
+        }
+
+        if self.tags:
+            _snippet['tags'] = self.tags.split(',')
+
+        if self.visibility == 2:
+            _snippet['pass_code'] = self.pass_code
+
+        _snippet['created_at'] = str(self.created_at)
+        _snippet['mode'] = language['mode']
+        return _snippet
+
+    # edit, language is the ext the form posts back
+    def to_edit(self):
+        _snippet = {
+            'uid': self.uid,
+            'title': self.title,
+            'source_code': self.source_code,
+            'language': self.language,
+            'visibility': self.visibility,
+            'theme': self.theme,
+        }
+
+        if self.tags:
+            _snippet['tags'] = self.tags.split(',')
+
+        if self.visibility == 2:
+            _snippet['pass_code'] = self.pass_code
+
+        _snippet['mode'] = get_language(self.language)['mode']
+        return _snippet
+
+
+# listing projections, the columns a listing selects and how one of its rows
+# becomes an item, the rows never carry the full source_code
+
+# public listing, the stored preview stands in for the source_code
+list_columns = (
+    Snippet.id,
+    Snippet.uid,
+    Snippet.title,
+    Snippet.preview,
+    Snippet.language,
+    Snippet.tags,
+    Snippet.theme,
+    Snippet.created_at,
+    User.name.label('owner'),
+)
+
+
+def list_item(row):
+    language = get_language(row.language)
+    snippet = {
+        'uid': row.uid,
+        'title': row.title,
+        'source_code': row.preview,
+        'language': language['name'],
+        'theme': row.theme,
+        'owner': row.owner,
+    }
+    if row.tags:
+        snippet['tags'] = row.tags.split(',')
+    snippet['created_at'] = str(row.created_at)
+    snippet['mode'] = language['mode']
+    return snippet
+
+
+# the owner's library: title, tags, language, visibility and timestamps
+owner_list_columns = (
+    Snippet.id,
+    Snippet.uid,
+    Snippet.title,
+    Snippet.language,
+    Snippet.visibility,
+    Snippet.tags,
+    Snippet.created_at,
+    Snippet.updated_at,
+    User.name.label('owner'),
+)
+
+
+def owner_list_item(row):
+    snippet = {
+        'id': row.id,
+        'uid': row.uid,
+        'title': row.title,
+        '_lang': row.language,
+        'language': get_language(row.language)['name'],
+        'visibility': row.visibility,
+        'owner': row.owner,
+    }
+    if row.tags:
+        snippet['tags'] = row.tags.split(',')
+    snippet['created_at'] = str(row.created_at)
+    snippet['updated_at'] = str(row.updated_at)
+    return snippet
+
+
+# export of a library, the fields the bulk import reads back
+export_columns = (
+    Snippet.id,
+    Snippet.uid,
+    Snippet.title,
+    Snippet.source_code,
+    Snippet.language,
+    Snippet.tags,
+    Snippet.visibility,
+    Snippet.pass_code,
+    Snippet.theme,
+    Snippet.created_at,
+    Snippet.updated_at,
+)
+
+
+def export_item(row):
+    snippet = {
+        'uid': row.uid,
+        'title': row.title,
+        'source_code': row.source_code,
+        'language': row.language,
+        'tags': row.tags.split(',') if row.tags else None,
+        'visibility': row.visibility,
+        'pass_code': row.pass_code,
+        'theme': row.theme,
+        'created_at': str(row.created_at),
+    }
+    if row.updated_at is not None:
+        snippet['updated_at'] = str(row.updated_at)
+    return snippet
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, Table
+
+from database import Base
+
+
+class Tag(Base):
+    __tablename__ = 'tags'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # normalized (trimmed, lowercase), what ?tag= matches exactly
+    name = Column(String(50), unique=True, nullable=False)
+
+
+# snippet <-> tag, the primary key serves "tags of a snippet" and the tag
+# filter's per snippet lookups, the reverse index "snippets with a tag"
+snippet_tags = Table(
+    'snippet_tags',
+    Base.metadata,
+    Column(
+        'snippet_id',
+        Integer,
+        ForeignKey('snippets.id', ondelete='CASCADE'),
+        primary_key=True
+    ),
+    Column(
+        'tag_id',
+        Integer,
+        ForeignKey('tags.id', ondelete='CASCADE'),
+        primary_key=True
+    ),
+    Index('ix_snippet_tags_tag_id_snippet_id', 'tag_id', 'snippet_id'),
+)
@@ -1,31 +1,28 @@
-from fastapi import APIRouter, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Request
 
-from lib.data.languages import languages
-from lib.data.themes import themes
+from lib.registry import languages, themes
+from utils.Precomputed import PrecomputedJSON
 
 router = APIRouter()
 
+# static reference data, encoded once instead of on every request
+languages_payload = PrecomputedJSON({
+    'data': {
+        'languages': languages
+    }
+})
+themes_payload = PrecomputedJSON({
+    'data': {
+        'themes': themes
+    }
+})
+
 
 @router.get("/data/languages")
-async def get_languages():
-    return JSONResponse(
-        status_code=status.HTTP_200_OK,
-        content={
-            'data': {
-                'languages': languages
-            }
-        }
-    )
+async def get_languages(request: Request):
+    return languages_payload.response(request)
 
 
 @router.get("/data/themes")
-async def get_themes():
-	return JSONResponse(
-		status_code=status.HTTP_200_OK,
-		content={
-			'data': {
-				'themes': themes
-			}
-		}
-	)
+async def get_themes(request: Request):
+    return themes_payload.response(request)
@@ -1,20 +1,50 @@
-from typing import Annotated
+from os import environ
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from fastapi.responses import JSONResponse
+import orjson
 
-from database import db
-from models.Snippet import Snippet, get_language
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+from database import engine, get_async_db
+from models.Snippet import (
+    Snippet,
+    list_columns,
+    list_item,
+    owner_list_columns,
+    owner_list_item,
+)
 
 from schemas.SnippetSchema import (
     createSnippetSchema,
+    reviewBatchSchema,
     reviewSnippetSchema,
     privateSnippetSchema,
     updateSnippetSchema
 )
-from services.code_review_service import review_code
-from sqlalchemy import desc
-from utils import UID
+from services import (
+    count_service,
+    export_service,
+    import_service,
+    review_cache,
+    search_service,
+    snippet_cache,
+    tag_service,
+)
+from services.code_review_service import ReviewServiceUnavailable
+from services.review_jobs import QueueFull, job_queue
+from sqlalchemy import String, and_, desc, literal, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, undefer
+from utils import UID, Cursor
+from utils.Conditional import (
+    http_date,
+    is_conditional,
+    make_etag,
+    not_modified,
+    not_modified_response,
+    validator_headers,
+)
 from validators.snippetValidator import (
     validate_snippet,
     validate_new_snippet,
@@ -23,55 +53,258 @@ from validators.snippetValidator import (
     validate_delete_snippet,
 )
 
-from middlewares import get_current_user
+from middlewares import get_current_user, get_current_user2
 
 router = APIRouter()
 
+review_batch_max_items = int(environ.get('REVIEW_BATCH_MAX_ITEMS', 50))
+review_batch_concurrency = int(environ.get('REVIEW_BATCH_CONCURRENCY', 5))
+# largest page a listing serves
+max_page_size = int(environ.get('MAX_PAGE_SIZE', 100))
+
+
+# rows strictly after the (created_at, id) position of a listing cursor
+def after_cursor(cursor):
+    try:
+        created_at, id = Cursor.decode(cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+
+    # sqlite keeps CURRENT_TIMESTAMP as 'YYYY-MM-DD HH:MM:SS' text and compares
+    # it as text, the bound value has to be written the same way
+    if engine.dialect.name == 'sqlite' and not created_at.microsecond:
+        created_at = literal(created_at.strftime('%Y-%m-%d %H:%M:%S'), String)
+
+    return or_(
+        Snippet.created_at < created_at,
+        and_(Snippet.created_at == created_at, Snippet.id < id)
+    )
+
+
+# exact ?tag= filter of the listings, every tag (all) or any of them
+def tag_filter(tag, tag_match):
+    if tag_match not in ('all', 'any'):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail='tag_match must be all or any'
+        )
+    names = tag_service.parse_filter(tag)
+    return names, tag_service.tag_condition(names, tag_match)
+
+
 # review a code snippet
 @router.post('/snippets/review')
-def code_review(
+async def code_review(
     request: Request,
     snippet: reviewSnippetSchema,
     # user=Depends(get_current_user),
+    db=Depends(get_async_db),
 ):
     try:
-        message = review_code(snippet.source_code)
-        return JSONResponse(
+        message, cached = await review_cache.review(
+            db, snippet.source_code, snippet.language
+        )
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 'detail': 'Code reviewed successfully',
                 'data': {
-                    'message': message
+                    'message': message,
+                    'cached': cached
                 }
             }
         )
+    except ReviewServiceUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# review many code snippets at once, by source or by snippet uid
+@router.post('/snippets/review/batch')
+async def code_review_batch(
+    request: Request,
+    batch: reviewBatchSchema,
+    user=Depends(get_current_user2),
+    db=Depends(get_async_db),
+):
+    if len(batch.items) > review_batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f'A batch can have at most {review_batch_max_items} items'
+        )
+
+    try:
+        uids = {item.uid for item in batch.items if item.uid is not None}
+        snippets = {}
+        if uids:
+            rows = (await db.execute(
+                select(
+                    Snippet.uid,
+                    Snippet.source_code,
+                    Snippet.language,
+                    Snippet.visibility,
+                    Snippet.user_id
+                ).where(Snippet.uid.in_(uids))
+            )).all()
+            snippets = {row.uid: row for row in rows}
+
+        # per item error, or the source to review
+        results = [None] * len(batch.items)
+        sources = {}
+        for i, item in enumerate(batch.items):
+            if (item.source_code is None) == (item.uid is None):
+                results[i] = {'error': 'Provide either source_code or uid'}
+                continue
+
+            if item.uid is not None:
+                snippet = snippets.get(item.uid)
+                if snippet is None:
+                    results[i] = {'error': 'Snippet not found'}
+                    continue
+                if snippet.visibility == 2 and (
+                    user is None or user.get('id') != snippet.user_id
+                ):
+                    results[i] = {'error': 'This is a private snippet'}
+                    continue
+                source_code = snippet.source_code
+                language = snippet.language
+            else:
+                source_code = item.source_code
+                language = item.language
+
+            source_code = source_code.strip()
+            if source_code == '':
+                results[i] = {'error': 'Source code cannot be blank'}
+                continue
+            sources[i] = (source_code, language)
+
+        reviews = await review_cache.review_many(
+            db, list(sources.values()), review_batch_concurrency
+        )
+        for i, (message, cached, error) in zip(sources.keys(), reviews):
+            if error is not None:
+                results[i] = {'error': str(error)}
+            else:
+                results[i] = {'message': message, 'cached': cached}
+
+        for item, result in zip(batch.items, results):
+            if item.uid is not None:
+                result['uid'] = item.uid
+
+        return ORJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                'detail': 'Code reviewed successfully',
+                'data': {
+                    'results': results
+                }
+            }
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# queue a review, the result is polled or streamed with the job id
+@router.post('/snippets/review/jobs')
+async def create_review_job(request: Request, snippet: reviewSnippetSchema):
+    try:
+        job = await job_queue.submit(snippet.source_code, snippet.language)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return ORJSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            'detail': 'Code review queued',
+            'data': {
+                'job': job
+            }
+        }
+    )
+
+
+# poll a review job
+@router.get('/snippets/review/jobs/{job_id}')
+async def show_review_job(request: Request, job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Review job not found')
+
+    return ORJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            'detail': 'Review job fetched successfully',
+            'data': {
+                'job': job
+            }
+        }
+    )
+
+
+# follow a review job as server-sent events, one per state change
+@router.get('/snippets/review/jobs/{job_id}/events')
+async def review_job_events(request: Request, job_id: str):
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail='Review job not found')
+
+    async def stream():
+        async for job in job_queue.events(job_id):
+            yield f"event: {job['status']}\ndata: {orjson.dumps(job).decode()}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 # create a snippet
 @router.post('/snippets')
-def store(
+async def store(
     request: Request,
     snippet: Annotated[createSnippetSchema, Depends(validate_new_snippet)],
     user=Depends(get_current_user),
+    db=Depends(get_async_db),
 ):
     try:
-        new_snippet = Snippet(
-            uid=UID.generate(),
-            title=snippet.title,
-            source_code=snippet.source_code,
-            language=snippet.language,
-            tags=snippet.tags,
-            visibility=snippet.visibility,
-            pass_code=snippet.pass_code if snippet.pass_code is not None else None,
-            theme=snippet.theme if snippet.theme is not None else 'monokai',
-            user_id=user.get('id')
-        )
-        db.add(new_snippet)
-        db.commit()
-
-        return JSONResponse(
+        # uids are generated without a lookup, a rare clash with an existing
+        # one is caught by the unique constraint and retried with a new uid
+        for attempt in range(UID.MAX_ATTEMPTS):
+            new_snippet = Snippet(
+                uid=UID.generate(),
+                title=snippet.title,
+                source_code=snippet.source_code,
+                language=snippet.language,
+                tags=snippet.tags,
+                visibility=snippet.visibility,
+                pass_code=snippet.pass_code if snippet.pass_code is not None else None,
+                theme=snippet.theme if snippet.theme is not None else 'monokai',
+                user_id=user.get('id')
+            )
+            db.add(new_snippet)
+
+            try:
+                # the insert is flushed in here, a uid clash is retried
+                if snippet.tags:
+                    await db.flush()
+                    await tag_service.add_tags(db, [(new_snippet.id, snippet.tags)])
+                if new_snippet.visibility == 1:
+                    await count_service.adjust_public_total(db, 1)
+                await db.commit()
+                break
+            except IntegrityError:
+                await db.rollback()
+                if attempt == UID.MAX_ATTEMPTS - 1:
+                    raise
+
+        await db.refresh(new_snippet, ['created_at', 'updated_at', 'user'])
+        search_service.index_snippet(new_snippet)
+
+        return ORJSONResponse(
             status_code=status.HTTP_201_CREATED,
             content={
                 'detail': 'Snippet create successfully',
@@ -84,53 +317,110 @@ def store(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# bulk import a JSONL body (one snippet per line) or a zip of source files,
+# visibility and theme are the defaults of the rows that don't set them
+@router.post('/snippets/import')
+async def import_snippets(
+    request: Request,
+    user=Depends(get_current_user),
+    db=Depends(get_async_db),
+    visibility: int = 1,
+    theme: str = 'monokai',
+):
+    defaults = {'visibility': visibility, 'theme': theme}
+
+    try:
+        rows = import_service.rows_of(request)
+        report = await import_service.import_snippets(
+            db, rows, user.get('id'), defaults
+        )
+    except import_service.InvalidImport as e:
+        if e.report is None:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        # earlier batches are already saved
+        return ORJSONResponse(
+            status_code=e.status_code,
+            content={'detail': str(e), 'data': e.report}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return ORJSONResponse(
+        status_code=status.HTTP_201_CREATED if report['imported'] else status.HTTP_200_OK,
+        content={
+            'detail': f"{report['imported']} snippets imported, {report['failed']} failed",
+            'data': report
+        }
+    )
+
+
 # get only your snippets
 @router.get('/snippets/my')
-def get_my_snippets(
+async def get_my_snippets(
     request: Request,
     user=Depends(get_current_user),
+    db=Depends(get_async_db),
     q: str = '',
-    page: int = 1,
-    limit: int = 10,
+    page: Annotated[int, Query(ge=1)] = 1,
+    limit: Annotated[int, Query(ge=1, le=max_page_size)] = 10,
+    cursor: str = None,
+    tag: Annotated[Optional[list[str]], Query()] = None,
+    tag_match: str = 'all',
 ):
+    filters = [Snippet.user_id == user.get('id')]
+    if cursor is not None:
+        filters.append(after_cursor(cursor))
+    _, condition = tag_filter(tag, tag_match)
+    if condition is not None:
+        filters.append(condition)
+
     try:
-        title_condition = Snippet.title.ilike(f"%{q}%")
-        tag_condition = Snippet.tags.ilike(f"%{q}%")
-
-        snippets = (
-            db.query(Snippet)
-            .filter(
-                Snippet.user_id == user.get('id'),
-                title_condition | tag_condition
-            )
-            .order_by(desc(Snippet.created_at))
-            .limit(limit)
-            .offset((page - 1) * limit)
-            .all()
-        )
+        ordering = [desc(Snippet.created_at), desc(Snippet.id)]
 
-        if len(snippets) == 0:
-            return JSONResponse(
+        search_condition, rank = search_service.search_condition(
+            q, user.get('id')
+        )
+        if search_condition is not None:
+            filters.append(search_condition)
+        # a cursor walks the listing by recency, ranking only applies to pages
+        by_recency = rank is None or cursor is not None
+        if not by_recency:
+            ordering.insert(0, desc(rank))
+
+        query = (
+            select(*owner_list_columns)
+            .join(Snippet.user)
+            .where(*filters)
+            .order_by(*ordering)
+            .limit(limit + 1)
+        )
+        if cursor is None:
+            query = query.offset((page - 1) * limit)
+
+        rows = (await db.execute(query)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            if by_recency:
+                next_cursor = Cursor.encode(rows[-1].created_at, rows[-1].id)
+
+        if len(rows) == 0:
+            return ORJSONResponse(
                 status_code=404,
                 content={
                     'detail': 'No snippets found',
                 }
             )
 
-        snippets = [snippet.serialize() for snippet in snippets]
-        # filer only the title, tags, language, visibility, created_at, updated_at
-        for snippet in snippets:
-            del snippet['source_code']
-            if snippet['visibility'] == 2:
-                del snippet['pass_code']
-            del snippet['theme']
+        snippets = [owner_list_item(row) for row in rows]
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content={
                 'detail': 'Snipppets fetched successfully',
                 'data': {
-                    'snippets': snippets
+                    'snippets': snippets,
+                    'next_cursor': next_cursor
                 }
             }
         )
@@ -138,64 +428,115 @@ def get_my_snippets(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# download your whole library, as NDJSON (one snippet per line, the bulk
+# import reads it back) or as a zip of title.ext files
+@router.get('/snippets/export')
+async def export_snippets(
+    request: Request,
+    user=Depends(get_current_user),
+    db=Depends(get_async_db),
+    format: str = 'ndjson',
+):
+    if format == 'ndjson':
+        chunks = export_service.ndjson_chunks(db, user.get('id'))
+        media_type = 'application/x-ndjson'
+    elif format == 'zip':
+        chunks = export_service.zip_chunks(db, user.get('id'))
+        media_type = 'application/zip'
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail='Format must be ndjson or zip'
+        )
+
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={
+            'Content-Disposition': f'attachment; filename="snippets.{format}"',
+            'Cache-Control': 'private, no-store',
+        }
+    )
+
+
 # get all public snippets
 @router.get('/snippets')
-def index(
+async def index(
     request: Request,
+    db=Depends(get_async_db),
     q: str = '',
-    page: int = 1,
-    limit: int = 10,
+    page: Annotated[int, Query(ge=1)] = 1,
+    limit: Annotated[int, Query(ge=1, le=max_page_size)] = 10,
+    cursor: str = None,
+    with_total: bool = True,
+    tag: Annotated[Optional[list[str]], Query()] = None,
+    tag_match: str = 'all',
 ):
+    filters = [Snippet.visibility == 1]
+    keyset = after_cursor(cursor) if cursor is not None else None
+    tag_names, condition = tag_filter(tag, tag_match)
+    if condition is not None:
+        filters.append(condition)
+
     try:
-        title_condition = Snippet.title.ilike(f"%{q}%")
-        tag_condition = Snippet.tags.ilike(f"%{q}%")
-
-        total_count = (
-            db.query(Snippet)
-            .filter(
-                Snippet.visibility == 1,
-                title_condition | tag_condition
+        ordering = [desc(Snippet.created_at), desc(Snippet.id)]
+
+        search_condition, rank = search_service.search_condition(q)
+        if search_condition is not None:
+            filters.append(search_condition)
+        # a cursor walks the listing by recency, ranking only applies to pages
+        by_recency = rank is None or cursor is not None
+        if not by_recency:
+            ordering.insert(0, desc(rank))
+
+        # the total is over the whole listing, not just what's after the cursor
+        total_count = None
+        if with_total and search_condition is None and condition is None:
+            total_count = await count_service.public_total(db)
+        elif with_total:
+            total_count = await count_service.filtered_total(
+                db,
+                filters,
+                ('public', q.strip().lower(), tuple(tag_names), tag_match)
             )
-            .count()
-        )
 
-        snippets = (
-            db.query(Snippet)
-            .filter(
-                Snippet.visibility == 1,
-                title_condition | tag_condition
-            )
-            .order_by(desc(Snippet.created_at))
-            .limit(limit)
-            .offset((page - 1) * limit)
-            .all()
+        query = (
+            select(*list_columns)
+            .join(Snippet.user)
+            .where(*filters)
+            .order_by(*ordering)
+            .limit(limit + 1)
         )
-
-        if len(snippets) == 0:
-            return JSONResponse(
+        if keyset is not None:
+            query = query.where(keyset)
+        else:
+            query = query.offset((page - 1) * limit)
+
+        rows = (await db.execute(query)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            if by_recency:
+                next_cursor = Cursor.encode(rows[-1].created_at, rows[-1].id)
+
+        if len(rows) == 0:
+            return ORJSONResponse(
                 status_code=404,
                 content={
                     'detail': 'No snippets found',
                 }
             )
 
-        snippets = [snippet.serialize() for snippet in snippets]
-        for snippet in snippets:
-            del snippet['id']
-            del snippet['visibility']
-            del snippet['updated_at']
-            snippet['mode'] = get_language(snippet['_lang'])['mode']
-            del snippet['_lang']
-            snippet['source_code'] = snippet['source_code'][:200] if len(
-                snippet['source_code']) > 200 else snippet['source_code']
-
-        return JSONResponse(
+        snippets = [list_item(row) for row in rows]
+
+        return ORJSONResponse(
             status_code=200,
             content={
                 'detail': 'Snipppets fetched successfully',
                 'data': {
                     'snippets': snippets,
-                    'total': total_count
+                    'total': total_count,
+                    'next_cursor': next_cursor
                 }
             }
         )
@@ -203,40 +544,120 @@ def index(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# the few columns needed to authorize a request and tell the snippet version,
+# lets a conditional request answer 304 without loading the full row
+async def get_snippet_version(db, uid):
+    return (await db.execute(
+        select(
+            Snippet.visibility,
+            Snippet.user_id,
+            Snippet.pass_code,
+            Snippet.version,
+            Snippet.created_at,
+            Snippet.updated_at
+        ).where(Snippet.uid == uid)
+    )).first()
+
+
 # get a single snippet
 @router.get('/snippets/{uid}')
-def show(request: Request, snippet: Snippet = Depends(validate_snippet)):
+async def show(request: Request, uid: str, db=Depends(get_async_db)):
+    # public snippets are served from the cache, without any query
+    cached = await snippet_cache.get(uid)
+
+    if cached is not None:
+        etag, last_modified = cached['etag'], cached['last_modified']
+        if not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+    else:
+        user = await get_current_user2(request, db)
+        # a user who just wrote reads from the primary, ahead of what the
+        # replicas serve everyone else, so it isn't cached. a replica read
+        # can't put back a version an update invalidated, the tombstone
+        # outlives the replica lag
+        from_primary = db.info.get('primary', False)
+
+        if is_conditional(request):
+            version = await get_snippet_version(db, uid)
+            if version is not None and (
+                version.visibility == 1
+                or (user and user.get('id') == version.user_id)
+            ):
+                etag = make_etag(
+                    uid, version.version, version.created_at, version.updated_at
+                )
+                last_modified = http_date(version.created_at, version.updated_at)
+                if not_modified(request, etag, last_modified):
+                    return not_modified_response(
+                        etag, last_modified, public=version.visibility == 1
+                    )
+
+        # raises the not found / private errors
+        snippet = await validate_snippet(request, uid, user, db)
+
     try:
-        _snippet = snippet.serialize()
-        del _snippet['id']
-        del _snippet['visibility']
-        del _snippet['updated_at']
-        _snippet['mode'] = get_language(_snippet['_lang'])['mode']
-        del _snippet['_lang']
-
-        return JSONResponse(
-            status_code=200,
-            content={
-                'detail': 'Snipppet fetched successfully',
-                'data': {
-                    'snippet': _snippet
-                }
+        if cached is None:
+            etag = make_etag(uid, snippet.version, snippet.created_at, snippet.updated_at)
+            last_modified = http_date(snippet.created_at, snippet.updated_at)
+
+            _snippet = snippet.to_detail()
+
+            cached = {
+                'snippet': _snippet,
+                'etag': etag,
+                'last_modified': last_modified,
+                'public': snippet.visibility == 1
             }
+            if snippet.visibility == 1 and not from_primary:
+                await snippet_cache.put(uid, cached)
+
+        content = {
+            'detail': 'Snipppet fetched successfully',
+            'data': {
+                'snippet': cached['snippet']
+            }
+        }
+        headers = validator_headers(
+            cached['etag'], cached['last_modified'], cached['public']
         )
+
+        if cached['public']:
+            # hot public snippets keep their encoded and compressed bodies
+            body = snippet_cache.encoded_body(uid, cached, lambda: orjson.dumps(content))
+            return body.response(request, headers=headers)
+
+        return ORJSONResponse(status_code=200, content=content, headers=headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # get a private snippet with passcode
 @router.post('/snippets/private/{uid}')
-def show_private_snippet(request: Request, uid: str, form_data: privateSnippetSchema):
+async def show_private_snippet(
+    request: Request,
+    uid: str,
+    form_data: privateSnippetSchema,
+    db=Depends(get_async_db)
+):
+    if is_conditional(request):
+        version = await get_snippet_version(db, uid)
+        if version is not None and version.pass_code == form_data.pass_code:
+            etag = make_etag(
+                uid, version.version, version.created_at, version.updated_at
+            )
+            last_modified = http_date(version.created_at, version.updated_at)
+            if not_modified(request, etag, last_modified):
+                return not_modified_response(etag, last_modified, public=False)
+
     try:
-        snippet = db.query(Snippet).filter(
-            Snippet.uid == uid
-        ).first()
+        snippet = await db.scalar(
+            select(Snippet)
+            .options(joinedload(Snippet.user), undefer(Snippet.source_code))
+            .where(Snippet.uid == uid)
+        )
 
         if snippet is None:
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=404,
                 content={
                     'detail': 'Snippets not found',
@@ -244,28 +665,27 @@ def show_private_snippet(request: Request, uid: str, form_data: privateSnippetSc
             )
 
         if (snippet.pass_code != form_data.pass_code):
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=403,
                 content={
                     'detail': 'Access denied, provide the correct passcode'
                 }
             )
 
-        _snippet = snippet.serialize()
-        del _snippet['id']
-        del _snippet['visibility']
-        del _snippet['updated_at']
-        _snippet['mode'] = get_language(_snippet['_lang'])['mode']
-        del _snippet['_lang']
+        etag = make_etag(uid, snippet.version, snippet.created_at, snippet.updated_at)
+        last_modified = http_date(snippet.created_at, snippet.updated_at)
+
+        _snippet = snippet.to_detail()
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content={
                 'detail': 'Snipppet fetched successfully',
                 'data': {
                     'snippet': _snippet
                 }
-            }
+            },
+            headers=validator_headers(etag, last_modified, public=False)
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -273,31 +693,40 @@ def show_private_snippet(request: Request, uid: str, form_data: privateSnippetSc
 
 # edit a single snippet
 @router.get('/snippets/{uid}/edit')
-def edit(
+async def edit(
     request: Request,
     uid: str,
-    snippet: Snippet = Depends(validate_edit_snippet)
+    user=Depends(get_current_user),
+    db=Depends(get_async_db)
 ):
-    try:
-        _snippet = snippet.serialize()
-        del _snippet['id']
-        del _snippet['created_at']
-        del _snippet['updated_at']
-        del _snippet['owner']
+    if is_conditional(request):
+        version = await get_snippet_version(db, uid)
+        if version is not None and version.user_id == user.get('id'):
+            etag = make_etag(
+                uid, version.version, version.created_at, version.updated_at
+            )
+            last_modified = http_date(version.created_at, version.updated_at)
+            if not_modified(request, etag, last_modified):
+                return not_modified_response(etag, last_modified, public=False)
 
-        _snippet['mode'] = get_language(_snippet['_lang'])['mode']
-        _snippet['language'] = _snippet['_lang']
+    # raises the not found / not the owner errors
+    snippet = await validate_edit_snippet(request, uid, user, db)
 
-        del _snippet['_lang']
+    try:
+        etag = make_etag(uid, snippet.version, snippet.created_at, snippet.updated_at)
+        last_modified = http_date(snippet.created_at, snippet.updated_at)
+
+        _snippet = snippet.to_edit()
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content={
                 'detail': 'Snipppet fetched successfully',
                 'data': {
                     'snippet': _snippet
                 }
-            }
+            },
+            headers=validator_headers(etag, last_modified, public=False)
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -305,31 +734,43 @@ def edit(
 
 # update a snippet
 @router.put('/snippets/{uid}')
-def update(
+async def update(
     request: Request,
     uid: str,
     snippet: Annotated[updateSnippetSchema, Depends(validate_update_snippet)],
-    user=Depends(get_current_user)
+    user=Depends(get_current_user),
+    db=Depends(get_async_db)
 ):
     try:
-        existing_snippet = db.query(Snippet).filter(Snippet.uid == uid).first()
+        existing_snippet = await db.scalar(
+            select(Snippet).where(Snippet.uid == uid)
+        )
+
+        was_public = existing_snippet.visibility == 1
 
         if snippet.title is not None:
-            snippet.title = snippet.title.strip()
+            existing_snippet.title = snippet.title
         if snippet.source_code is not None:
             existing_snippet.source_code = snippet.source_code
         if snippet.language is not None:
             existing_snippet.language = snippet.language
         if snippet.tags is not None:
-            existing_snippet.visibility = snippet.visibility
+            existing_snippet.tags = snippet.tags if snippet.tags else None
+            await tag_service.set_tags(db, existing_snippet.id, snippet.tags)
         if snippet.visibility is not None:
+            existing_snippet.visibility = snippet.visibility
             existing_snippet.pass_code = snippet.pass_code
         if snippet.theme is not None:
             existing_snippet.theme = snippet.theme
 
-        db.commit()
+        await count_service.adjust_public_total(
+            db, int(existing_snippet.visibility == 1) - int(was_public)
+        )
+        await db.commit()
+        search_service.index_snippet(existing_snippet)
+        await snippet_cache.invalidate(uid)
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content={
                 'detail': 'Snippet updated successfully'
@@ -341,17 +782,24 @@ def update(
 
 # delete a snippet
 @router.delete('/snippets/{uid}')
-def destroy(
+async def destroy(
     request: Request,
     uid: str,
     user=Depends(get_current_user),
-    snippet: Snippet = Depends(validate_delete_snippet)
+    snippet: Snippet = Depends(validate_delete_snippet),
+    db=Depends(get_async_db)
 ):
     try:
-        db.delete(snippet)
-        db.commit()
-
-        return JSONResponse(
+        snippet_id = snippet.id
+        if snippet.visibility == 1:
+            await count_service.adjust_public_total(db, -1)
+        await tag_service.clear_tags(db, snippet_id)
+        await db.delete(snippet)
+        await db.commit()
+        search_service.remove_snippet(snippet_id)
+        await snippet_cache.invalidate(uid)
+
+        return ORJSONResponse(
             status_code=204,
             content={
                 'detail': 'Snippet deleted successfully',
@@ -4,11 +4,12 @@ from typing import Annotated
 
 import httpx
 from fastapi import APIRouter, Depends, HTTPException, Request, status
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import ORJSONResponse, RedirectResponse
 from passlib.exc import UnknownHashError
-from sqlalchemy import and_
+from sqlalchemy import and_, select
 
-from database import db
+from database import bind_user, get_async_db
+from middlewares import user_cache
 from models.User import User
 from schemas.UserSchema import (
     createUserSchema,
@@ -107,7 +108,10 @@ router = APIRouter()
 
 # Login using Google OAuth
 @router.post('/users/auth/google-login')
-def google_oauth_login(form_data: callbackSchema):
+async def google_oauth_login(
+    form_data: callbackSchema,
+    db=Depends(get_async_db)
+):
     data = {
         "code": form_data.code,
         "client_id": environ.get('GOOGLE_CLIENT_ID'),
@@ -116,26 +120,34 @@ def google_oauth_login(form_data: callbackSchema):
         "grant_type": "authorization_code",
     }
 
-    response = httpx.post("https://oauth2.googleapis.com/token", data=data)
-    if response.status_code == 200:
-        access_token = response.json()["access_token"]
-
-        userinfo_response = httpx.get(
-            "https://www.googleapis.com/oauth2/v3/userinfo",
-            headers={"Authorization": f"Bearer {access_token}"}
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            "https://oauth2.googleapis.com/token", data=data
         )
+        if response.status_code == 200:
+            userinfo_response = await client.get(
+                "https://www.googleapis.com/oauth2/v3/userinfo",
+                headers={
+                    "Authorization": f"Bearer {response.json()['access_token']}"
+                }
+            )
 
+    if response.status_code == 200:
         if userinfo_response.status_code == 200:
             userinfo = userinfo_response.json()
 
             response_message = 'Login successful'
+            # a new account must be readable by the requests that follow
+            bind_user(db, userinfo.get('email'))
             try:
-                user = db.query(User).filter(
-                    and_(
-                        User.email == userinfo.get("email"),
-                        User.google_auth == 1
+                user = await db.scalar(
+                    select(User).where(
+                        and_(
+                            User.email == userinfo.get("email"),
+                            User.google_auth == 1
+                        )
                     )
-                ).first()
+                )
 
                 if not user:
                     try:
@@ -147,7 +159,7 @@ def google_oauth_login(form_data: callbackSchema):
                         )
 
                         db.add(user)
-                        db.commit()
+                        await db.commit()
                         response_message = 'Welcome to Codeglimpse!'
                     except Exception as e:
                         raise HTTPException(
@@ -155,6 +167,9 @@ def google_oauth_login(form_data: callbackSchema):
                             detail=str(e)+'err from create user',
                         )
 
+                # created or logged in again, drop any stale cached copy
+                user_cache.invalidate(user.email)
+
                 access_token = Auth.create_access_token(
                     data={'sub': user.email}
                 )
@@ -164,7 +179,7 @@ def google_oauth_login(form_data: callbackSchema):
 
                 _user = user.serialize()
                 _user['picture'] = userinfo.get('picture')
-                response = JSONResponse(
+                response = ORJSONResponse(
                     status_code=status.HTTP_200_OK,
                     content={
                         'detail': response_message,
@@ -213,8 +228,8 @@ def google_oauth_login(form_data: callbackSchema):
 
 # refresh token
 @router.post('/users/auth/refreshtoken')
-def refresh_token(request: Request):
-    token_exception = JSONResponse(
+async def refresh_token(request: Request, db=Depends(get_async_db)):
+    token_exception = ORJSONResponse(
         status_code=status.HTTP_400_BAD_REQUEST,
         content={'detail': 'Unauthorized'},
         headers={'WWW-Authenticate': 'Bearer'},
@@ -230,7 +245,7 @@ def refresh_token(request: Request):
         email = payload.get('sub')
         if not email:
             raise token_exception
-        user = db.query(User).filter(User.email == email).first()
+        user = await db.scalar(select(User).where(User.email == email))
         if not user:
             raise token_exception
 
@@ -242,7 +257,7 @@ def refresh_token(request: Request):
     try:
         access_token = Auth.create_access_token(data={'sub': user.email})
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 'detail': 'Authentication successful',
@@ -269,7 +284,7 @@ def refresh_token(request: Request):
 # Logout
 @router.post('/users/auth/logout')
 def logout(request: Request):
-    response = JSONResponse(
+    response = ORJSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             'detail': 'Logout successful',
@@ -5,6 +5,8 @@ from pydantic import BaseModel, field_validator
 
 class reviewSnippetSchema(BaseModel):
     source_code: str
+    # ext of the language, helps the local static analysis
+    language: Optional[str] = None
 
     @field_validator('source_code')
     def validate_blank_source_code_field(cls, value):
@@ -16,6 +18,26 @@ class reviewSnippetSchema(BaseModel):
             )
         return value
 
+class reviewBatchItemSchema(BaseModel):
+    # either the source itself or the uid of a snippet to review
+    source_code: Optional[str] = None
+    uid: Optional[str] = None
+    language: Optional[str] = None
+
+
+class reviewBatchSchema(BaseModel):
+    items: list[reviewBatchItemSchema]
+
+    @field_validator('items')
+    def validate_items_field(cls, value):
+        if len(value) == 0:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail='Items cannot be empty'
+            )
+        return value
+
+
 class createSnippetSchema(BaseModel):
     title: str
     source_code: str
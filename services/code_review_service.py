@@ -1,36 +1,176 @@
-import openai
-from os import environ
+import asyncio
 import json
+import random
+import time
+from os import environ
 
-import requests
+import httpx
+import openai
+
+from services import static_review_service
 
 # Load your API key from an environment variable or secret management service
 openai.api_key = environ.get('OPENAI_API_KEY')
 
+connect_timeout = float(environ.get('CODE_REVIEW_CONNECT_TIMEOUT', 5))
+read_timeout = float(environ.get('CODE_REVIEW_READ_TIMEOUT', 60))
+pool_size = int(environ.get('CODE_REVIEW_POOL_SIZE', 20))
+max_retries = int(environ.get('CODE_REVIEW_MAX_RETRIES', 2))
+retry_backoff = float(environ.get('CODE_REVIEW_RETRY_BACKOFF', 0.5))
 
-def review_code(source_code):
-    try:
-        service_url = environ.get('CODE_REVIEW_SERVICE_URL')
-        # send a post request to the code review service with the source_code, endpoint is /review-code
-        payload = json.dumps({
-            "source_code": source_code
-        })
-        headers = {
-            'Content-Type': 'application/json'
-        }
-
-        response = requests.request(
-            "POST",
-            service_url + '/review-code',
-            headers=headers,
-            data=payload
+# remote: the review service, local: the built-in static analysis,
+# fallback: the review service, static analysis when it fails
+backend = environ.get('CODE_REVIEW_BACKEND', 'remote')
+
+# shared keep-alive client, opened and closed by the app lifespan
+client = None
+
+
+class ReviewServiceUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops calling the review service after failure_threshold consecutive
+    failures, for reset_timeout seconds. After that one trial call is let
+    through, it closes the circuit again on success.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def before_call(self):
+        """Raises while open, True when this call is the half-open trial."""
+        if self.opened_at is None:
+            return False
+
+        if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_running:
+            raise ReviewServiceUnavailable(
+                'Code review service is unavailable, try again later'
+            )
+        self.trial_running = True
+        return True
+
+    def end_trial(self):
+        # a trial that ended without an outcome (cancelled) lets the next one in
+        self.trial_running = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_running = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(
+    failure_threshold=int(environ.get('CODE_REVIEW_BREAKER_THRESHOLD', 5)),
+    reset_timeout=float(environ.get('CODE_REVIEW_BREAKER_RESET', 30))
+)
+
+
+async def start():
+    global client
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                read_timeout, connect=connect_timeout, pool=connect_timeout
+            ),
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size
+            ),
         )
 
+
+async def stop():
+    global client
+    if client is not None:
+        await client.aclose()
+        client = None
+
+
+def is_retryable(e):
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, httpx.TransportError)
+
+
+async def post_review(source_code):
+    service_url = environ.get('CODE_REVIEW_SERVICE_URL')
+
+    for attempt in range(max_retries + 1):
+        try:
+            response = await client.post(
+                service_url + '/review-code',
+                json={"source_code": source_code}
+            )
+            response.raise_for_status()
+            return response
+
+        except Exception as e:
+            if not is_retryable(e):
+                # the service answered, just not with a review
+                breaker.record_success()
+                raise e
+
+            if attempt == max_retries:
+                breaker.record_failure()
+                raise e
+
+            # exponential backoff with full jitter
+            await asyncio.sleep(random.uniform(0, retry_backoff * 2 ** attempt))
+
+
+async def review_code_remote(source_code):
+    # not started through the lifespan (scripts, tests), open it lazily
+    if client is None:
+        await start()
+
+    trial = breaker.before_call()
+    try:
+        response = await post_review(source_code)
+
         # it will return a json with {message, and data}, just take the data and return it
-        response_text = json.loads(response.text)
-        # print(response_text)
-        return response_text['data']
+        try:
+            message = json.loads(response.text)['data']
+        except (ValueError, KeyError, TypeError):
+            # answered, but not with a review, the service is broken
+            breaker.record_failure()
+            raise
+
+        breaker.record_success()
+        return message
+    finally:
+        if trial:
+            breaker.end_trial()
+
+
+async def review_code_with_engine(source_code, language=None):
+    """Reviews with the configured backend, returns the (message, engine) pair."""
+    if backend == 'local':
+        message = await static_review_service.review_code(source_code, language)
+        return message, 'local'
+
+    try:
+        return await review_code_remote(source_code), 'remote'
+    except Exception:
+        if backend != 'fallback':
+            raise
+
+    message = await static_review_service.review_code(source_code, language)
+    return message, 'local'
+
 
-    except Exception as e:
-        # print(e)
-        raise e
+async def review_code(source_code, language=None):
+    message, _ = await review_code_with_engine(source_code, language)
+    return message
@@ -0,0 +1,68 @@
+from os import environ
+
+from sqlalchemy import func, select, update
+
+from models.Counter import PUBLIC_SNIPPETS, Counter
+from models.Snippet import Snippet
+from utils.Cache import TTLCache
+
+# filtered totals above the cap are reported as e.g. '1000+'
+count_cap = int(environ.get('COUNT_CAP', 1000))
+count_cache = TTLCache(
+    maxsize=int(environ.get('COUNT_CACHE_SIZE', 1000)),
+    ttl=int(environ.get('COUNT_CACHE_TTL', 30))
+)
+
+
+async def public_total(db):
+    """
+    Exact number of public snippets, read from the counters table which the
+    write paths keep up to date. The row is seeded with the table (m003), a
+    database missing it gets a COUNT(*) and is left for the migration to fix.
+    """
+    total = await db.scalar(
+        select(Counter.value).where(Counter.name == PUBLIC_SNIPPETS)
+    )
+    if total is not None:
+        return total
+
+    return await db.scalar(
+        select(func.count())
+        .select_from(Snippet)
+        .where(Snippet.visibility == 1)
+    )
+
+
+async def filtered_total(db, filters, key):
+    """
+    Total of a filtered listing, counted up to count_cap and cached for a
+    short while under key.
+    """
+    total = count_cache.get(key)
+    if total is not None:
+        return total
+
+    capped = await db.scalar(
+        select(func.count()).select_from(
+            select(Snippet.id)
+            .where(*filters)
+            .limit(count_cap + 1)
+            .subquery()
+        )
+    )
+    total = f'{count_cap}+' if capped > count_cap else capped
+    count_cache.set(key, total)
+
+    return total
+
+
+# run inside the write's transaction, before its commit
+async def adjust_public_total(db, delta):
+    if delta == 0:
+        return
+
+    await db.execute(
+        update(Counter)
+        .where(Counter.name == PUBLIC_SNIPPETS)
+        .values(value=Counter.value + delta)
+    )
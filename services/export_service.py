@@ -0,0 +1,95 @@
+import re
+import zipfile
+from os import environ
+
+import anyio
+import orjson
+from sqlalchemy import select
+
+from models.Snippet import Snippet, export_columns, export_item
+
+batch_size = int(environ.get('EXPORT_BATCH_SIZE', 500))
+
+# characters file systems don't take in a name
+unsafe_filename = re.compile(r'[\x00-\x1f\\/:*?"<>|]+')
+
+
+def library_query(user_id):
+    # oldest first, an import of the export keeps the original order
+    return (
+        select(*export_columns)
+        .where(Snippet.user_id == user_id)
+        .order_by(Snippet.created_at, Snippet.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+
+async def partitions(db, user_id):
+    """The user's snippets in batch_size lists of rows, off a server side cursor."""
+    result = await db.stream(library_query(user_id))
+    try:
+        async for partition in result.partitions():
+            yield partition
+    finally:
+        await result.close()
+
+
+async def ndjson_chunks(db, user_id):
+    async for partition in partitions(db, user_id):
+        yield b''.join(
+            orjson.dumps(export_item(row)) + b'\n' for row in partition
+        )
+
+
+class ChunkBuffer:
+    """Write only file a zip is streamed into, drained after every batch."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def filename(row, taken):
+    title = unsafe_filename.sub('_', row.title).strip().lstrip('.') or row.uid
+    name = f'{title}.{row.language}'
+    if name in taken:
+        # same title twice, the uid keeps both files
+        name = f'{title}-{row.uid}.{row.language}'
+    taken.add(name)
+    return name
+
+
+def write_partition(archive, partition, taken):
+    for row in partition:
+        archive.writestr(filename(row, taken), row.source_code.encode('utf-8'))
+
+
+async def zip_chunks(db, user_id):
+    """
+    Zip of title.ext files. The archive is written to an unseekable buffer,
+    so each member carries a data descriptor and the bytes of a batch can be
+    sent as soon as it is compressed. Only the central directory (names and
+    offsets) stays in memory until the end.
+    """
+    buffer = ChunkBuffer()
+    taken = set()
+    archive = zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED)
+
+    async for partition in partitions(db, user_id):
+        # deflating is CPU work, keep it off the event loop
+        await anyio.to_thread.run_sync(write_partition, archive, partition, taken)
+        yield buffer.drain()
+
+    archive.close()
+    yield buffer.drain()
@@ -0,0 +1,313 @@
+import posixpath
+import zipfile
+from os import environ
+from tempfile import SpooledTemporaryFile
+
+import anyio
+import orjson
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from models.Snippet import PREVIEW_LENGTH, Snippet
+from schemas.SnippetSchema import createSnippetSchema
+from services import count_service, search_service, tag_service
+from utils import UID
+from validators.snippetValidator import check_new_snippet
+
+batch_size = int(environ.get('IMPORT_BATCH_SIZE', 500))
+# a batch is also sent once its sources add up to this, keeps each
+# statement under the server's packet limit
+batch_max_bytes = int(environ.get('IMPORT_BATCH_MAX_BYTES', 8 * 1024 * 1024))
+max_upload_bytes = int(environ.get('IMPORT_MAX_BYTES', 100 * 1024 * 1024))
+# a single file of a zip or line of a jsonl body
+max_row_bytes = int(environ.get('IMPORT_MAX_ROW_BYTES', 1024 * 1024))
+# zip uploads are spooled to a temp file past this, the index is at the end
+spool_memory_bytes = int(environ.get('IMPORT_SPOOL_MEMORY_BYTES', 4 * 1024 * 1024))
+# errors listed in the report, the rest are only counted
+max_reported_errors = int(environ.get('IMPORT_MAX_REPORTED_ERRORS', 1000))
+
+zip_types = ('application/zip', 'application/x-zip-compressed')
+jsonl_types = (
+    'application/x-ndjson',
+    'application/jsonl',
+    'application/x-jsonlines',
+    'application/json',
+    'text/plain',
+)
+
+# the columns bigger than their value could be, one bad row must not fail
+# the whole multi-row insert
+title_length = Snippet.title.type.length
+tags_length = Snippet.tags.type.length
+
+
+class InvalidImport(Exception):
+    status_code = 400
+    # rows handled before the error, set once any were
+    report = None
+
+
+class ImportTooLarge(InvalidImport):
+    status_code = 413
+
+
+class UnsupportedImport(InvalidImport):
+    status_code = 415
+
+
+class RowError(Exception):
+    pass
+
+
+def language_of(filename):
+    _, ext = posixpath.splitext(filename)
+    return ext[1:].lower()
+
+
+async def limited(stream):
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > max_upload_bytes:
+            raise ImportTooLarge(f'Uploads are limited to {max_upload_bytes} bytes')
+        yield chunk
+
+
+async def jsonl_rows(stream):
+    """(line number, row dict or RowError) per line, one line in memory at a time."""
+    number = 0
+    pending = b''
+    skipping = False
+
+    async for chunk in stream:
+        if skipping:
+            # rest of a line already reported too long
+            newline = chunk.find(b'\n')
+            if newline == -1:
+                continue
+            chunk = chunk[newline + 1:]
+            skipping = False
+
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, parse_line(line)
+
+        if len(pending) > max_row_bytes:
+            number += 1
+            yield number, RowError(f'Line is longer than {max_row_bytes} bytes')
+            pending = b''
+            skipping = True
+
+    if pending.strip():
+        yield number + 1, parse_line(pending)
+
+
+def parse_line(line):
+    if len(line) > max_row_bytes:
+        return RowError(f'Line is longer than {max_row_bytes} bytes')
+    try:
+        row = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return RowError('Invalid JSON')
+    if not isinstance(row, dict):
+        return RowError('Row must be a JSON object')
+    return row
+
+
+def read_member(archive, info):
+    with archive.open(info) as member:
+        data = member.read(max_row_bytes + 1)
+    if len(data) > max_row_bytes:
+        return RowError(f'File is larger than {max_row_bytes} bytes')
+
+    try:
+        source_code = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return RowError('File is not UTF-8 text')
+
+    filename = posixpath.basename(info.filename)
+    title, _ = posixpath.splitext(filename)
+    return {
+        'title': title[:title_length],
+        'source_code': source_code,
+        'language': language_of(filename),
+    }
+
+
+async def zip_rows(stream):
+    """(file name, row dict or RowError) per file of the archive."""
+    with SpooledTemporaryFile(max_size=spool_memory_bytes) as spool:
+        async for chunk in stream:
+            await anyio.to_thread.run_sync(spool.write, chunk)
+
+        try:
+            archive = zipfile.ZipFile(spool)
+        except zipfile.BadZipFile:
+            raise InvalidImport('Invalid zip archive')
+
+        with archive:
+            for info in archive.infolist():
+                name = info.filename
+                basename = posixpath.basename(name)
+                # folders and the metadata archivers add
+                if info.is_dir() or basename.startswith('.') or name.startswith('__MACOSX/'):
+                    continue
+                yield name, await anyio.to_thread.run_sync(read_member, archive, info)
+
+
+def rows_of(request):
+    content_type = request.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    stream = limited(request.stream())
+
+    if content_type in zip_types:
+        return zip_rows(stream)
+    if content_type in jsonl_types:
+        return jsonl_rows(stream)
+
+    raise UnsupportedImport('Send a JSONL body or a zip archive')
+
+
+def error_detail(error):
+    if isinstance(error, HTTPException):
+        return error.detail
+    if isinstance(error, ValidationError):
+        first = error.errors()[0]
+        return f"{'.'.join(str(loc) for loc in first['loc'])}: {first['msg']}"
+    return str(error)
+
+
+def to_values(row, defaults, user_id):
+    """Column values of a row, raises RowError for any rule it breaks."""
+    if isinstance(row, RowError):
+        raise row
+
+    row = {**defaults, **row}
+    if not row.get('language') and isinstance(row.get('title'), str):
+        row['language'] = language_of(row['title'])
+
+    try:
+        snippet = check_new_snippet(createSnippetSchema(**row))
+    except (HTTPException, ValidationError) as e:
+        raise RowError(error_detail(e))
+
+    if len(snippet.title) > title_length:
+        raise RowError(f'Title is longer than {title_length} characters')
+    if snippet.tags is not None and len(snippet.tags) > tags_length:
+        raise RowError(f'Tags are longer than {tags_length} characters')
+
+    return {
+        'title': snippet.title,
+        'source_code': snippet.source_code,
+        'preview': snippet.source_code[:PREVIEW_LENGTH],
+        'language': snippet.language,
+        'tags': snippet.tags,
+        'visibility': snippet.visibility,
+        'pass_code': snippet.pass_code,
+        'theme': snippet.theme,
+        'user_id': user_id,
+    }
+
+
+async def link_tags(db, batch):
+    tagged = [values for values in batch if values['tags']]
+    if not tagged:
+        return
+
+    ids = dict((await db.execute(
+        select(Snippet.uid, Snippet.id)
+        .where(Snippet.uid.in_([values['uid'] for values in tagged]))
+    )).all())
+    await tag_service.add_tags(
+        db, [(ids[values['uid']], values['tags']) for values in tagged]
+    )
+
+
+async def insert_batch(db, batch):
+    # uids are generated without a lookup, a clash fails the batch which is
+    # retried with new uids, like store does for one snippet
+    for attempt in range(UID.MAX_ATTEMPTS):
+        for values in batch:
+            values['uid'] = UID.generate()
+
+        try:
+            await db.execute(insert(Snippet).values(batch))
+            await link_tags(db, batch)
+            await count_service.adjust_public_total(
+                db, sum(1 for values in batch if values['visibility'] == 1)
+            )
+            await db.commit()
+            break
+        except IntegrityError:
+            await db.rollback()
+            if attempt == UID.MAX_ATTEMPTS - 1:
+                raise
+
+    if search_service.inverted_index is not None:
+        rows = (await db.execute(
+            select(*search_service.indexed_columns)
+            .where(Snippet.uid.in_([values['uid'] for values in batch]))
+        )).all()
+        for row in rows:
+            search_service.index_snippet(row)
+
+
+async def import_snippets(db, rows, user_id, defaults):
+    """
+    Validates and inserts the rows as they arrive, batch_size at a time with
+    one multi-row insert and commit per batch. Returns the report with the
+    number of imported and failed rows and the first errors, an upload
+    failing midway raises InvalidImport with the report so far attached.
+    """
+    report = {'imported': 0, 'failed': 0, 'errors': []}
+    batch = []
+    refs = []
+    batch_bytes = 0
+
+    def fail(ref, detail):
+        report['failed'] += 1
+        if len(report['errors']) < max_reported_errors:
+            report['errors'].append({'row': ref, 'detail': detail})
+
+    async def flush():
+        nonlocal batch_bytes
+        try:
+            await insert_batch(db, batch)
+            report['imported'] += len(batch)
+        except Exception as e:
+            await db.rollback()
+            for ref in refs:
+                fail(ref, f'Not saved: {e}')
+        batch.clear()
+        refs.clear()
+        batch_bytes = 0
+
+    try:
+        async for ref, row in rows:
+            try:
+                values = to_values(row, defaults, user_id)
+            except RowError as e:
+                fail(ref, str(e))
+                continue
+
+            batch.append(values)
+            refs.append(ref)
+            batch_bytes += len(values['source_code'])
+            if len(batch) >= batch_size or batch_bytes >= batch_max_bytes:
+                await flush()
+    except InvalidImport as e:
+        # the batches before the error are committed, the client gets
+        # told about them along with the error
+        for ref in refs:
+            fail(ref, f'Not saved: {e}')
+        e.report = report
+        raise
+
+    if batch:
+        await flush()
+
+    return report
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+from hashlib import sha256
+from os import environ
+
+from sqlalchemy import delete, select
+
+from database import session_scope
+from models.ReviewCache import ReviewCache
+from services.code_review_service import review_code_with_engine
+from utils.Cache import TTLCache
+
+# bump it whenever the review service changes, old results stop matching
+review_version = environ.get('CODE_REVIEW_VERSION', '1')
+cache_ttl = int(environ.get('REVIEW_CACHE_TTL', 7 * 24 * 3600))
+db_max_rows = int(environ.get('REVIEW_CACHE_DB_MAX_ROWS', 100000))
+# share of writes that also prune the table
+prune_rate = 0.01
+
+memory_cache = TTLCache(
+    maxsize=int(environ.get('REVIEW_CACHE_SIZE', 1000)),
+    ttl=cache_ttl
+)
+
+
+def cache_key(source_code):
+    # same code modulo line endings and trailing whitespace is the same review
+    lines = source_code.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    normalized = '\n'.join(line.rstrip() for line in lines).strip()
+    return sha256(f'{review_version}\n{normalized}'.encode()).hexdigest()
+
+
+async def get(db, key):
+    message = memory_cache.get(key)
+    if message is not None:
+        return message
+
+    row = await db.scalar(
+        select(ReviewCache).where(
+            ReviewCache.key == key,
+            ReviewCache.expires_at > datetime.utcnow()
+        )
+    )
+    if row is None:
+        return None
+
+    message = json.loads(row.message)
+    memory_cache.set(key, message)
+    return message
+
+
+async def put(db, key, message):
+    memory_cache.set(key, message)
+
+    now = datetime.utcnow()
+    # the persistent tier is best effort, a failed write must not fail a review
+    try:
+        await db.execute(delete(ReviewCache).where(ReviewCache.key == key))
+        db.add(ReviewCache(
+            key=key,
+            message=json.dumps(message),
+            created_at=now,
+            expires_at=now + timedelta(seconds=cache_ttl)
+        ))
+        await db.commit()
+
+        if random.random() < prune_rate:
+            await prune(db)
+    except Exception:
+        await db.rollback()
+
+
+async def prune(db):
+    """Drops expired rows and the oldest ones beyond db_max_rows."""
+    await db.execute(
+        delete(ReviewCache).where(ReviewCache.expires_at <= datetime.utcnow())
+    )
+    cutoff = await db.scalar(
+        select(ReviewCache.created_at)
+        .order_by(ReviewCache.created_at.desc())
+        .offset(db_max_rows)
+        .limit(1)
+    )
+    if cutoff is not None:
+        await db.execute(
+            delete(ReviewCache).where(ReviewCache.created_at <= cutoff)
+        )
+    await db.commit()
+
+
+async def review(db, source_code, language=None):
+    """Review through the cache, returns the (message, served from cache) pair."""
+    key = cache_key(source_code)
+
+    message = await get(db, key)
+    if message is not None:
+        return message, True
+    # the lookup left a transaction open, its connection would otherwise
+    # stay checked out for the whole (minutes long) review
+    await db.commit()
+
+    # only the review service is worth caching, the static analysis is cheap
+    # and a fallback result must not stand in for a real review later
+    message, engine = await review_code_with_engine(source_code, language)
+    if engine == 'remote':
+        await put(db, key, message)
+    return message, False
+
+
+async def review_detached(source_code, language=None):
+    """
+    review for work outside of a request, e.g. the job workers. The cache
+    read and write get short sessions of their own, none is held while the
+    review runs.
+    """
+    key = cache_key(source_code)
+
+    async with session_scope() as db:
+        message = await get(db, key)
+    if message is not None:
+        return message, True
+
+    message, engine = await review_code_with_engine(source_code, language)
+    if engine == 'remote':
+        async with session_scope() as db:
+            await put(db, key, message)
+    return message, False
+
+
+async def review_many(db, sources, concurrency):
+    """
+    Reviews a list of (source_code, language) pairs with at most concurrency
+    calls to the review service in flight, identical sources are reviewed
+    once. Returns one (message, served from cache, error) triple per source,
+    in order.
+    """
+    results = [None] * len(sources)
+    pending = {}
+
+    for i, (source_code, language) in enumerate(sources):
+        key = cache_key(source_code)
+        message = await get(db, key)
+        if message is not None:
+            results[i] = (message, True, None)
+        else:
+            pending.setdefault(key, []).append(i)
+    # hand the connection back to the pool for the reviews, like review
+    await db.commit()
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(key, source_code, language):
+        async with semaphore:
+            try:
+                message, engine = await review_code_with_engine(
+                    source_code, language
+                )
+                return key, message, engine, None
+            except Exception as e:
+                return key, None, None, e
+
+    outcomes = await asyncio.gather(*(
+        run(key, *sources[indexes[0]]) for key, indexes in pending.items()
+    ))
+
+    # the session can't be shared by the concurrent calls, store afterwards
+    for key, message, engine, error in outcomes:
+        if engine == 'remote':
+            await put(db, key, message)
+        for i in pending[key]:
+            results[i] = (message, False, error)
+
+    return results
@@ -0,0 +1,163 @@
+import asyncio
+from abc import ABC, abstractmethod
+from importlib import import_module
+from os import environ
+from uuid import uuid4
+
+from services import review_cache
+from utils.Cache import TTLCache
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+FINISHED = (DONE, FAILED)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ReviewJobQueue(ABC):
+    """
+    Interface of the review job backends. A job is a dict with id, status
+    (queued, running, done, failed) and, once finished, result/cached or
+    error. Set REVIEW_JOB_BROKER to 'module:Class' to plug in another
+    implementation, e.g. one backed by an external broker.
+    """
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def submit(self, source_code, language=None):
+        """Queues a review, returns the new job. Raises QueueFull."""
+
+    @abstractmethod
+    async def get(self, job_id):
+        """The job, None if it's unknown or expired."""
+
+    @abstractmethod
+    def events(self, job_id):
+        """
+        Async iterator of the job's state, every change until it finishes.
+        A job that expires meanwhile ends it with a failed state.
+        """
+
+
+class InProcessJobQueue(ReviewJobQueue):
+    """
+    asyncio queue worked by a pool of tasks inside the app process, jobs
+    live in memory for job_ttl seconds.
+    """
+
+    def __init__(self, workers=4, max_queued=1000, job_ttl=3600, poll_interval=5):
+        self.workers = workers
+        # how often a waiting events() checks its job is still there
+        self.poll_interval = poll_interval
+        self.jobs = TTLCache(maxsize=max_queued * 10, ttl=job_ttl)
+        self.queue = None
+        self.max_queued = max_queued
+        self.tasks = []
+        self.subscribers = {}
+
+    async def start(self):
+        if self.queue is not None:
+            return
+
+        self.queue = asyncio.Queue(maxsize=self.max_queued)
+        self.tasks = [
+            asyncio.create_task(self.work()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.queue = None
+
+    async def submit(self, source_code, language=None):
+        if self.queue is None:
+            await self.start()
+
+        job = {'id': uuid4().hex, 'status': QUEUED}
+        try:
+            self.queue.put_nowait((job['id'], source_code, language))
+        except asyncio.QueueFull:
+            raise QueueFull('Too many reviews queued, try again later')
+
+        self.jobs.set(job['id'], job)
+        return dict(job)
+
+    async def get(self, job_id):
+        job = self.jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def events(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+
+        queue = asyncio.Queue()
+        self.subscribers.setdefault(job_id, []).append(queue)
+        try:
+            yield dict(job)
+            while job['status'] not in FINISHED:
+                try:
+                    job = await asyncio.wait_for(queue.get(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    if self.jobs.get(job_id) is None:
+                        # expired or evicted, no change will ever come
+                        yield {'id': job_id, 'status': FAILED, 'error': 'Review job expired'}
+                        return
+                    continue
+                yield dict(job)
+        finally:
+            self.subscribers[job_id].remove(queue)
+            if not self.subscribers[job_id]:
+                del self.subscribers[job_id]
+
+    def update(self, job_id, **changes):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+
+        job.update(changes)
+        for queue in self.subscribers.get(job_id, ()):
+            queue.put_nowait(dict(job))
+
+    async def work(self):
+        while True:
+            job_id, source_code, language = await self.queue.get()
+            try:
+                self.update(job_id, status=RUNNING)
+                message, cached = await review_cache.review_detached(
+                    source_code, language
+                )
+                self.update(job_id, status=DONE, result=message, cached=cached)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.update(job_id, status=FAILED, error=str(e))
+            finally:
+                self.queue.task_done()
+
+
+def make_job_queue():
+    broker = environ.get('REVIEW_JOB_BROKER')
+    if broker:
+        module, _, name = broker.partition(':')
+        return getattr(import_module(module), name)()
+
+    return InProcessJobQueue(
+        workers=int(environ.get('REVIEW_JOB_WORKERS', 4)),
+        max_queued=int(environ.get('REVIEW_JOB_QUEUE_SIZE', 1000)),
+        job_ttl=int(environ.get('REVIEW_JOB_TTL', 3600))
+    )
+
+
+job_queue = make_job_queue()
@@ -0,0 +1,210 @@
+import heapq
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from operator import itemgetter
+from os import environ
+from threading import Lock
+
+from sqlalchemy import and_, case, false, literal_column, func, select
+from sqlalchemy.dialects.mysql import match
+
+from database import engine, session_scope
+from models.Snippet import Snippet, search_document
+from services import count_service
+
+dialect = engine.dialect.name
+
+# innodb_ft_min_token_size of the server, shorter terms aren't in the mysql
+# full-text index and are matched with ILIKE instead
+mysql_min_token_size = int(environ.get('SEARCH_MIN_TOKEN_SIZE', 3))
+# matches the in-process index hands to the query, the best scored ones,
+# keeps the IN (...) and CASE of the sqlite query bounded. Never below what
+# the filtered totals count, so a capped search still reads e.g. '1000+'
+max_matches = max(
+    int(environ.get('SEARCH_MAX_MATCHES', 1000)), count_service.count_cap + 1
+)
+
+
+def tokenize(string):
+    return re.findall(r'\w+', (string or '').lower())
+
+
+class InvertedIndex:
+    """
+    Pure python term -> {snippet id: term frequency} index over the title and
+    tags, for databases without a full-text engine (sqlite, tests). It lives
+    in the process memory, so only use it with a single worker. Knows who
+    may see each snippet, so a search only scores the visible ones.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        # snippet id -> (visibility, owner id)
+        self._access = {}
+        self._terms = []
+        self._terms_dirty = False
+        self._lock = Lock()
+
+    def add(self, snippet_id, title, tags, visibility, user_id):
+        with self._lock:
+            self._remove(snippet_id)
+            terms = tokenize(title) + tokenize(tags)
+            for term in terms:
+                postings = self._postings[term]
+                postings[snippet_id] = postings.get(snippet_id, 0) + 1
+            self._documents[snippet_id] = set(terms)
+            self._access[snippet_id] = (visibility, user_id)
+            self._terms_dirty = True
+
+    def remove(self, snippet_id):
+        with self._lock:
+            self._remove(snippet_id)
+
+    def _remove(self, snippet_id):
+        self._access.pop(snippet_id, None)
+        for term in self._documents.pop(snippet_id, ()):
+            postings = self._postings[term]
+            postings.pop(snippet_id, None)
+            if not postings:
+                del self._postings[term]
+                self._terms_dirty = True
+
+    def _prefixed(self, prefix):
+        if self._terms_dirty:
+            self._terms = sorted(self._postings)
+            self._terms_dirty = False
+
+        i = bisect_left(self._terms, prefix)
+        while i < len(self._terms) and self._terms[i].startswith(prefix):
+            yield self._terms[i]
+            i += 1
+
+    def search(self, query, user_id=None):
+        """
+        Every query term has to match a term of the snippet as a prefix,
+        returns {snippet id: score}, exact term hits score higher. Only the
+        public snippets, or only the ones of user_id when given.
+        """
+        if user_id is None:
+            def visible(snippet_id):
+                return self._access[snippet_id][0] == 1
+        else:
+            def visible(snippet_id):
+                return self._access[snippet_id][1] == user_id
+
+        scores = None
+        with self._lock:
+            for query_term in tokenize(query):
+                term_scores = {}
+                for term in self._prefixed(query_term):
+                    weight = 2 if term == query_term else 1
+                    for snippet_id, tf in self._postings[term].items():
+                        if not visible(snippet_id):
+                            continue
+                        term_scores[snippet_id] = (
+                            term_scores.get(snippet_id, 0) + tf * weight
+                        )
+
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        snippet_id: score + term_scores[snippet_id]
+                        for snippet_id, score in scores.items()
+                        if snippet_id in term_scores
+                    }
+
+                if not scores:
+                    break
+
+        return scores or {}
+
+
+inverted_index = InvertedIndex() if dialect not in ('postgresql', 'mysql') else None
+
+
+# the columns the in-process index keeps of a snippet
+indexed_columns = (
+    Snippet.id, Snippet.title, Snippet.tags, Snippet.visibility, Snippet.user_id
+)
+
+
+async def build_inverted_index(db):
+    rows = (await db.execute(select(*indexed_columns))).all()
+    for row in rows:
+        index_snippet(row)
+
+
+async def start():
+    # built before the app serves, no snippet can be created meanwhile
+    if inverted_index is not None:
+        async with session_scope() as db:
+            await build_inverted_index(db)
+
+
+# keep the in-process index in sync, the database engines maintain their own
+def index_snippet(snippet):
+    if inverted_index is not None:
+        inverted_index.add(
+            snippet.id, snippet.title, snippet.tags, snippet.visibility, snippet.user_id
+        )
+
+
+def remove_snippet(snippet_id):
+    if inverted_index is not None:
+        inverted_index.remove(snippet_id)
+
+
+def contains(term):
+    return Snippet.title.ilike(f"%{term}%") | Snippet.tags.ilike(f"%{term}%")
+
+
+def search_condition(q, user_id=None):
+    """
+    Full-text filter for the snippet listings, returns a (where clause,
+    rank expression) pair, (None, None) when there's nothing to search.
+    user_id is the owner of a library search, None searches the public
+    snippets, the listing filters by them too.
+    """
+    terms = tokenize(q)
+    if not terms:
+        if q.strip() == '':
+            return None, None
+
+        # nothing indexable (e.g. only symbols), fall back to a plain match
+        return contains(q), None
+
+    if dialect == 'postgresql':
+        document = literal_column(search_document)
+        query = func.to_tsquery(
+            'simple', ' & '.join(f'{term}:*' for term in terms)
+        )
+        return document.op('@@')(query), func.ts_rank(document, query)
+
+    if dialect == 'mysql':
+        indexed = [term for term in terms if len(term) >= mysql_min_token_size]
+        conditions = [
+            contains(term) for term in terms if len(term) < mysql_min_token_size
+        ]
+        rank = None
+        if indexed:
+            rank = match(
+                Snippet.title,
+                Snippet.tags,
+                against=' '.join(f'+{term}*' for term in indexed)
+            ).in_boolean_mode()
+            conditions.insert(0, rank)
+        return and_(*conditions), rank
+
+    scores = inverted_index.search(q, user_id)
+    if not scores:
+        return false(), None
+    if len(scores) > max_matches:
+        scores = dict(heapq.nlargest(max_matches, scores.items(), key=itemgetter(1)))
+
+    return (
+        Snippet.id.in_(scores.keys()),
+        case(scores, value=Snippet.id, else_=0)
+    )
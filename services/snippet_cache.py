@@ -0,0 +1,216 @@
+import asyncio
+import json
+from os import environ
+
+from utils.Cache import TTLCache
+from utils.Compression import EncodedBody
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # only needed with a redis:// SNIPPET_CACHE_BACKEND
+    redis = None
+
+cache_ttl = int(environ.get('SNIPPET_CACHE_TTL', 300))
+# without a backend reaching the other workers they never hear of an
+# invalidation, their local copies only live this long
+unshared_ttl = int(environ.get('SNIPPET_CACHE_UNSHARED_TTL', 5))
+# seconds before resubscribing after the invalidation feed dropped
+listen_retry = float(environ.get('SNIPPET_CACHE_LISTEN_RETRY', 1))
+local_cache = TTLCache(
+    maxsize=int(environ.get('SNIPPET_CACHE_SIZE', 5000)),
+    ttl=cache_ttl
+)
+# serialized and compressed response bodies, local to each worker
+body_cache = TTLCache(maxsize=local_cache.maxsize, ttl=cache_ttl)
+
+# an invalidated key refuses puts for this long, a request that loaded the
+# row before the write must not put the old copy back
+tombstone_ttl = int(environ.get('SNIPPET_CACHE_TOMBSTONE_TTL', 10))
+tombstones = TTLCache(maxsize=local_cache.maxsize, ttl=tombstone_ttl)
+# shared tier value of an invalidated key, never a JSON payload
+TOMBSTONE = '-'
+
+
+class MemoryBackend:
+    """
+    In-process stand-in for the shared backend, same interface as the redis
+    one, for tests and single worker setups.
+    """
+
+    # each worker has its own, the others don't see its invalidations
+    cross_process = False
+
+    def __init__(self):
+        self.data = TTLCache(maxsize=100000, ttl=cache_ttl)
+        self.listeners = []
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def add(self, key, value, ttl):
+        # only when absent, like SET NX, a tombstone keeps the key taken
+        if self.data.get(key) is None:
+            self.data.set(key, value, ttl)
+
+    async def tombstone(self, key, ttl):
+        self.data.set(key, TOMBSTONE, ttl)
+        for listener in self.listeners:
+            listener(key)
+
+    async def listen(self, on_invalidate, on_subscribe):
+        self.listeners.append(on_invalidate)
+        on_subscribe()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.listeners.remove(on_invalidate)
+
+
+class RedisBackend:
+    """
+    Shared tier over the redis protocol. Invalidations are also published, so
+    every worker drops the key from its local tier.
+    """
+
+    channel = 'snippet-cache:invalidate'
+    cross_process = True
+
+    def __init__(self, url, prefix='snippet:'):
+        if redis is None:
+            raise RuntimeError('Install the redis package to use a redis:// snippet cache')
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key):
+        return await self.client.get(self.prefix + key)
+
+    async def add(self, key, value, ttl):
+        await self.client.set(self.prefix + key, value, ex=ttl, nx=True)
+
+    async def tombstone(self, key, ttl):
+        await self.client.set(self.prefix + key, TOMBSTONE, ex=ttl)
+        await self.client.publish(self.channel, key)
+
+    async def listen(self, on_invalidate, on_subscribe):
+        """Runs until the connection drops, raising or returning."""
+        pubsub = self.client.pubsub()
+        try:
+            await pubsub.subscribe(self.channel)
+            on_subscribe()
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    key = message['data']
+                    on_invalidate(key.decode() if isinstance(key, bytes) else key)
+        finally:
+            await pubsub.close()
+
+
+def make_backend():
+    backend = environ.get('SNIPPET_CACHE_BACKEND', '')
+    if backend == 'memory':
+        return MemoryBackend()
+    if backend.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(backend)
+    return None
+
+
+shared = make_backend()
+listener = None
+
+
+def local_ttl():
+    if shared is not None and shared.cross_process:
+        return cache_ttl
+    return unshared_ttl
+
+
+async def listen():
+    # the invalidations sent while the feed was down are lost, every local
+    # copy is dropped once it is back
+    while True:
+        try:
+            await shared.listen(drop_local, clear_local)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            pass
+        await asyncio.sleep(listen_retry)
+
+
+async def start():
+    global listener
+    if shared is not None and listener is None:
+        listener = asyncio.create_task(listen())
+
+
+async def stop():
+    global listener
+    if listener is not None:
+        listener.cancel()
+        listener = None
+
+
+async def get(uid):
+    """Serialized public snippet, None on a miss."""
+    payload = local_cache.get(uid)
+    if payload is not None or shared is None:
+        return payload
+
+    try:
+        raw = await shared.get(uid)
+    except Exception:
+        # the shared tier is an optimization, fall through to the database
+        return None
+    if raw is None or raw in (TOMBSTONE, TOMBSTONE.encode()):
+        return None
+
+    payload = json.loads(raw)
+    local_cache.set(uid, payload, local_ttl())
+    return payload
+
+
+async def put(uid, payload):
+    # only ever public snippets, private ones must be checked per request
+    if tombstones.get(uid):
+        return
+
+    local_cache.set(uid, payload, local_ttl())
+    if shared is not None:
+        try:
+            await shared.add(uid, json.dumps(payload), cache_ttl)
+        except Exception:
+            pass
+
+
+def encoded_body(uid, payload, build):
+    """Response body of a cached snippet, rebuilt when its version changes."""
+    entry = body_cache.get(uid)
+    if entry is None or entry[0] != payload['etag']:
+        entry = (payload['etag'], EncodedBody(build()))
+        body_cache.set(uid, entry)
+    return entry[1]
+
+
+def drop_local(uid):
+    local_cache.invalidate(uid)
+    body_cache.invalidate(uid)
+    tombstones.set(uid, True)
+
+
+def clear_local():
+    local_cache.clear()
+    body_cache.clear()
+
+
+async def invalidate(uid):
+    """
+    Drops a snippet after a write. Runs once the write committed, so a
+    failing shared tier must not fail the request, its copy expires with
+    the TTL.
+    """
+    drop_local(uid)
+    if shared is not None:
+        try:
+            await shared.tombstone(uid, tombstone_ttl)
+        except Exception:
+            pass
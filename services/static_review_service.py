@@ -0,0 +1,304 @@
+import ast
+import asyncio
+import multiprocessing
+import re
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from os import environ
+
+try:
+    import resource
+except ImportError:  # not available on windows, analyses run without a memory cap
+    resource = None
+
+from lib.registry import get_language
+
+workers = int(environ.get('LOCAL_REVIEW_WORKERS', 2))
+time_limit = float(environ.get('LOCAL_REVIEW_TIMEOUT', 5))
+memory_limit_mb = int(environ.get('LOCAL_REVIEW_MEMORY_MB', 512))
+# workers stop themselves at time_limit, one still running past this is stuck
+hang_timeout = time_limit + 5
+
+MAX_LINE_LENGTH = 120
+MAX_FUNCTION_LINES = 60
+MAX_NESTING = 5
+
+c_like = {
+    'c', 'cpp', 'cs', 'dart', 'go', 'groovy', 'java', 'js', 'jsx', 'kt',
+    'mm', 'php', 'rs', 'scala', 'swift', 'ts', 'tsx', 'vue',
+}
+js_like = {'js', 'jsx', 'ts', 'tsx', 'vue'}
+hash_comments = {'py', 'rb', 'sh', 'pl', 'r', 'ps1', 'yaml', 'dockerfile', 'nginx', 'ex'}
+
+secret_pattern = re.compile(
+    r'(password|passwd|secret|api_?key|token)\s*[:=]\s*["\'][^"\']{6,}["\']',
+    re.IGNORECASE
+)
+
+
+class AnalysisTimeout(Exception):
+    pass
+
+
+# language independent checks, line by line
+def check_lines(source_code, ext):
+    issues = []
+    indents = set()
+    comment = '#' if ext in hash_comments else '//'
+
+    for number, line in enumerate(source_code.split('\n'), start=1):
+        if len(line) > MAX_LINE_LENGTH:
+            issues.append((number, f'Line is longer than {MAX_LINE_LENGTH} characters'))
+        if line != line.rstrip():
+            issues.append((number, 'Trailing whitespace'))
+
+        indent = line[:len(line) - len(line.lstrip())]
+        if indent:
+            indents.add('tab' if '\t' in indent else 'space')
+
+        stripped = line.strip()
+        if stripped.startswith(comment) and re.search(r'\b(TODO|FIXME|XXX)\b', stripped):
+            issues.append((number, 'Unresolved TODO/FIXME comment'))
+        if secret_pattern.search(line):
+            issues.append((number, 'Possible hardcoded secret, load it from the environment'))
+
+    if len(indents) > 1:
+        issues.append((None, 'Mixed tabs and spaces for indentation'))
+
+    return issues
+
+
+# tokenizer based checks for the brace languages
+def check_c_like(source_code, ext):
+    issues = []
+    depth = 0
+    reported = False
+    # drop string literals and comments so braces inside them don't count
+    code = re.sub(r'"(\\.|[^"\\])*"|\'(\\.|[^\'\\])*\'', '""', source_code)
+    code = re.sub(r'/\*.*?\*/', lambda m: '\n' * m.group().count('\n'), code, flags=re.S)
+    code = re.sub(r'//[^\n]*', '', code)
+
+    for number, line in enumerate(code.split('\n'), start=1):
+        for char in line:
+            if char == '{':
+                depth += 1
+                if depth > MAX_NESTING and not reported:
+                    issues.append((number, f'Blocks nested deeper than {MAX_NESTING} levels'))
+                    reported = True
+            elif char == '}':
+                depth -= 1
+
+        if re.search(r'catch\s*\([^)]*\)\s*\{\s*\}', line):
+            issues.append((number, 'Empty catch block swallows errors'))
+
+        if ext in js_like:
+            if re.search(r'\bconsole\.log\(', line):
+                issues.append((number, 'Leftover console.log'))
+            if re.search(r'\bdebugger\b', line):
+                issues.append((number, 'Leftover debugger statement'))
+            if re.search(r'\bvar\s', line):
+                issues.append((number, 'Use let or const instead of var'))
+            if re.search(r'[^=!<>]==[^=]|!=[^=]', line):
+                issues.append((number, 'Use strict equality (=== / !==)'))
+            if re.search(r'\beval\(', line):
+                issues.append((number, 'Avoid eval'))
+
+    if depth != 0:
+        issues.append((None, 'Unbalanced braces'))
+
+    return issues
+
+
+def check_sql(source_code):
+    issues = []
+    for number, line in enumerate(source_code.split('\n'), start=1):
+        if re.search(r'\bselect\s+\*', line, re.IGNORECASE):
+            issues.append((number, 'Select the needed columns instead of *'))
+        if re.search(r'\b(update|delete\s+from)\b', line, re.IGNORECASE) and \
+                not re.search(r'\bwhere\b', source_code, re.IGNORECASE):
+            issues.append((number, 'UPDATE/DELETE without a WHERE clause'))
+    return issues
+
+
+def check_python(source_code):
+    try:
+        tree = ast.parse(source_code)
+    except SyntaxError as e:
+        return [(e.lineno, f'Syntax error: {e.msg}')]
+
+    issues = []
+    imported = {}
+    used = set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == '*':
+                    issues.append((node.lineno, 'Wildcard import'))
+                    continue
+                name = (alias.asname or alias.name).split('.')[0]
+                imported.setdefault(name, node.lineno)
+
+        elif isinstance(node, ast.Name):
+            used.add(node.id)
+
+        elif isinstance(node, ast.Attribute):
+            root = node
+            while isinstance(root, ast.Attribute):
+                root = root.value
+            if isinstance(root, ast.Name):
+                used.add(root.id)
+
+        elif isinstance(node, ast.ExceptHandler) and node.type is None:
+            issues.append((node.lineno, 'Bare except catches everything, name the exception'))
+
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for default in node.args.defaults + node.args.kw_defaults:
+                if isinstance(default, (ast.List, ast.Dict, ast.Set)):
+                    issues.append((node.lineno, f'Mutable default argument in {node.name}()'))
+            length = (node.end_lineno or node.lineno) - node.lineno + 1
+            if length > MAX_FUNCTION_LINES:
+                issues.append((node.lineno, f'{node.name}() is {length} lines long, consider splitting it'))
+
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            if node.func.id in ('eval', 'exec'):
+                issues.append((node.lineno, f'Avoid {node.func.id}()'))
+
+        elif isinstance(node, ast.Compare):
+            for op, comparator in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.Eq, ast.NotEq)) and \
+                        isinstance(comparator, ast.Constant) and comparator.value is None:
+                    issues.append((node.lineno, 'Compare to None with is / is not'))
+
+    for name, number in imported.items():
+        if name not in used:
+            issues.append((number, f'{name} is imported but unused'))
+
+    return issues
+
+
+def analyze(source_code, ext=None):
+    if ext is None or get_language(ext) is None:
+        # no (valid) language given, treat it as python if it parses
+        try:
+            ast.parse(source_code)
+            ext = 'py'
+        except SyntaxError:
+            ext = 'txt'
+
+    issues = check_lines(source_code, ext)
+    if ext == 'py':
+        issues += check_python(source_code)
+    elif ext in c_like:
+        issues += check_c_like(source_code, ext)
+    elif ext == 'sql':
+        issues += check_sql(source_code)
+
+    language = get_language(ext)['name']
+    if not issues:
+        return f'Static analysis ({language}): no issues found.'
+
+    issues.sort(key=lambda issue: issue[0] or 0)
+    lines = [f'Static analysis ({language}): {len(issues)} issue(s) found.']
+    for number, message in issues:
+        lines.append(f'- Line {number}: {message}' if number else f'- {message}')
+    return '\n'.join(lines)
+
+
+def _on_timeout(signum, frame):
+    raise AnalysisTimeout('Static analysis took too long')
+
+
+def _limit_memory(limit_mb):
+    if resource is not None and limit_mb > 0:
+        limit = limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+# runs inside a pool process
+def run_analysis(source_code, ext, seconds):
+    if hasattr(signal, 'setitimer'):
+        signal.signal(signal.SIGALRM, _on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        return analyze(source_code, ext)
+    except MemoryError:
+        raise AnalysisTimeout('Static analysis ran out of memory')
+    finally:
+        if hasattr(signal, 'setitimer'):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+pool = None
+# pools replaced after a failure, their other analyses may still be running
+retired = []
+
+
+def get_pool():
+    global pool
+    if pool is None:
+        # spawn, forking the threaded app process isn't safe
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_limit_memory,
+            initargs=(memory_limit_mb,)
+        )
+    return pool
+
+
+def terminate(processes):
+    # a hung worker never picks up the shutdown, kill it so stuck processes
+    # don't pile up with every replaced pool
+    for process in processes:
+        process.terminate()
+    if processes in retired:
+        retired.remove(processes)
+
+
+def retire(executor):
+    """
+    Sends new analyses to a fresh pool after executor failed one. Its other
+    analyses still get hang_timeout to finish before its workers are killed.
+    """
+    global pool
+    # the callers failing with the same pool replace it once, not each
+    # other's replacements
+    if pool is not executor:
+        return
+    pool = None
+
+    processes = list((executor._processes or {}).values())
+    retired.append(processes)
+    executor.shutdown(wait=False)
+    asyncio.get_running_loop().call_later(hang_timeout, terminate, processes)
+
+
+def shutdown(terminate_workers=False):
+    global pool
+    for processes in list(retired):
+        terminate(processes)
+    if pool is not None:
+        old_pool, pool = pool, None
+        if terminate_workers:
+            terminate(list((old_pool._processes or {}).values()))
+        old_pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def review_code(source_code, language=None):
+    """Reviews the code in the process pool, off the event loop and the GIL."""
+    loop = asyncio.get_running_loop()
+    executor = get_pool()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(
+                executor, run_analysis, source_code, language, time_limit
+            ),
+            # the worker stops itself at time_limit, this only guards a stuck one
+            timeout=hang_timeout
+        )
+    except (BrokenProcessPool, asyncio.TimeoutError):
+        # a worker died or hung, new analyses go to a fresh pool
+        retire(executor)
+        raise AnalysisTimeout('Static analysis failed, try again')
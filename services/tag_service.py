@@ -0,0 +1,125 @@
+from sqlalchemy import and_, delete, exists, insert, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from database import engine
+from models.Snippet import Snippet
+from models.Tag import Tag, snippet_tags
+
+dialect = engine.dialect.name
+
+max_length = Tag.name.type.length
+
+
+def normalize(tags):
+    """
+    Unique tag names of a snippet, from the tags list of a request or the
+    comma joined Snippet.tags. Trimmed and lowercased, blanks dropped.
+    """
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        tags = tags.split(',')
+
+    names = []
+    for tag in tags:
+        name = tag.strip().lower()[:max_length]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def insert_ignore(table):
+    # insert that skips the rows already there, e.g. a tag created meanwhile
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == 'mysql':
+        return mysql.insert(table).prefix_with('IGNORE')
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+
+async def tag_ids(db, names):
+    """name -> id of the tags, creating the missing ones."""
+    if not names:
+        return {}
+
+    ids = dict((await db.execute(
+        select(Tag.name, Tag.id).where(Tag.name.in_(names))
+    )).all())
+
+    missing = [name for name in names if name not in ids]
+    if missing:
+        await db.execute(
+            insert_ignore(Tag.__table__),
+            [{'name': name} for name in missing]
+        )
+        # a locking read sees the tags another transaction committed since,
+        # a plain one is still on this transaction's snapshot (mysql
+        # repeatable read) and would miss the ones insert ignore skipped
+        ids.update((await db.execute(
+            select(Tag.name, Tag.id)
+            .where(Tag.name.in_(missing))
+            .with_for_update(read=True)
+        )).all())
+
+    return ids
+
+
+async def add_tags(db, snippets):
+    """
+    Links (snippet id, tags) pairs to their tags in one lookup and one
+    multi-row insert, for snippets that have no links yet.
+    """
+    snippets = [(snippet_id, normalize(tags)) for snippet_id, tags in snippets]
+    names = list({name: None for _, tags in snippets for name in tags})
+    if not names:
+        return
+
+    ids = await tag_ids(db, names)
+    await db.execute(insert(snippet_tags).values([
+        {'snippet_id': snippet_id, 'tag_id': ids[name]}
+        for snippet_id, tags in snippets
+        for name in tags
+    ]))
+
+
+async def clear_tags(db, snippet_id):
+    # explicit, sqlite doesn't enforce the ON DELETE CASCADE by default
+    await db.execute(
+        delete(snippet_tags).where(snippet_tags.c.snippet_id == snippet_id)
+    )
+
+
+async def set_tags(db, snippet_id, tags):
+    # links are rewritten, the snippet's tags come as a whole from the forms
+    await clear_tags(db, snippet_id)
+    await add_tags(db, [(snippet_id, tags)])
+
+
+def parse_filter(tags):
+    """Tag names of ?tag=, repeated or comma separated."""
+    return normalize([name for tag in tags or () for name in tag.split(',')])
+
+
+def tag_condition(names, match='all'):
+    """
+    Exact tag filter for the snippet listings: snippets having every tag of
+    names (match='all') or at least one (match='any'). None without names.
+    """
+    if not names:
+        return None
+
+    def has(tag_ids):
+        return exists().where(
+            snippet_tags.c.snippet_id == Snippet.id,
+            snippet_tags.c.tag_id.in_(tag_ids)
+        )
+
+    if match == 'any':
+        return has(select(Tag.id).where(Tag.name.in_(names)))
+
+    conditions = [
+        has(select(Tag.id).where(Tag.name == name)) for name in names
+    ]
+    return conditions[0] if len(conditions) == 1 else and_(*conditions)
@@ -0,0 +1,104 @@
+import os
+import tempfile
+
+# a throwaway sqlite database, set before anything imports database
+os.environ.setdefault('DB_CONNECTION', 'sqlite')
+os.environ.setdefault(
+    'DB_NAME',
+    os.path.join(tempfile.mkdtemp(prefix='codeglimpse-test-'), 'test.db')
+)
+os.environ.setdefault('ACCESS_TOKEN_SECRET', 'test-secret')
+os.environ.setdefault('REFRESH_TOKEN_SECRET', 'test-refresh-secret')
+os.environ.setdefault('ALGORITHM', 'HS256')
+os.environ.setdefault('ACCESS_TOKEN_EXPIRE_MINUTES', '15')
+os.environ.setdefault('REFRESH_TOKEN_EXPIRE_MINUTES', '1200')
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def schema():
+    from database import Base, engine
+    import models.Counter  # noqa: F401
+    import models.ReviewCache  # noqa: F401
+    import models.Snippet  # noqa: F401
+    import models.Tag  # noqa: F401
+    import models.User  # noqa: F401
+
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def db(schema):
+    from database import Session
+    from models.Snippet import Snippet
+    from models.Tag import Tag, snippet_tags
+    from models.User import User
+
+    session = Session(expire_on_commit=False)
+    yield session
+    session.rollback()
+    session.execute(snippet_tags.delete())
+    session.execute(Tag.__table__.delete())
+    session.execute(Snippet.__table__.delete())
+    session.execute(User.__table__.delete())
+    session.commit()
+    session.close()
+
+
+@pytest.fixture
+def client(schema):
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    # no `with`, the lifespan (review workers, cache listeners) isn't needed
+    return TestClient(app)
+
+
+@pytest.fixture
+def user(db):
+    from middlewares import user_cache
+    from models.User import User
+
+    user = User(name='Test', username='test', email='test@example.com', google_auth=1)
+    db.add(user)
+    db.commit()
+    yield user
+    user_cache.invalidate(user.email)
+
+
+@pytest.fixture
+def auth_headers(user):
+    from utils import Auth
+
+    token = Auth.create_access_token(data={'sub': user.email})
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def make_snippets(db, user):
+    from models.Snippet import Snippet
+    from utils import UID
+
+    def make_snippets(count, visibility=1, tags=None):
+        snippets = [
+            Snippet(
+                uid=UID.generate(),
+                title=f'snippet {i}',
+                source_code=f'print({i})',
+                language='py',
+                tags=tags,
+                visibility=visibility,
+                theme='monokai',
+                user_id=user.id,
+            )
+            for i in range(count)
+        ]
+        db.add_all(snippets)
+        db.commit()
+        return snippets
+
+    return make_snippets
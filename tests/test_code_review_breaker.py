@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from services import code_review_service
+from services.code_review_service import CircuitBreaker
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Points the review client at a handler, with a fresh breaker."""
+    monkeypatch.setenv('CODE_REVIEW_SERVICE_URL', 'http://review.test')
+    monkeypatch.setattr(code_review_service, 'breaker', CircuitBreaker(1, 30))
+
+    def use(handler):
+        monkeypatch.setattr(
+            code_review_service,
+            'client',
+            httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+        return code_review_service.breaker
+
+    return use
+
+
+def open_for_trial(breaker):
+    breaker.record_failure()
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout - 1
+
+
+def test_unparsable_review_counts_as_failure(service):
+    breaker = service(lambda request: httpx.Response(200, text='not json'))
+
+    with pytest.raises(ValueError):
+        asyncio.run(code_review_service.review_code_remote('print(1)'))
+
+    assert breaker.failures == 1
+    assert breaker.opened_at is not None
+
+
+def test_review_without_data_counts_as_failure(service):
+    breaker = service(lambda request: httpx.Response(200, json={'message': 'ok'}))
+
+    with pytest.raises(KeyError):
+        asyncio.run(code_review_service.review_code_remote('print(1)'))
+
+    assert breaker.failures == 1
+
+
+def test_cancelled_trial_lets_the_next_one_in(service):
+    async def hang(request):
+        await asyncio.sleep(60)
+
+    breaker = service(hang)
+    open_for_trial(breaker)
+
+    async def cancel_trial():
+        task = asyncio.create_task(code_review_service.review_code_remote('x'))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+
+    assert breaker.trial_running is False
+    assert breaker.before_call() is True
+
+
+def test_successful_trial_closes_the_circuit(service):
+    breaker = service(lambda request: httpx.Response(200, json={'data': 'fine'}))
+    open_for_trial(breaker)
+
+    assert asyncio.run(code_review_service.review_code_remote('x')) == 'fine'
+    assert breaker.opened_at is None
+    assert breaker.trial_running is False
@@ -0,0 +1,65 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from fastapi.testclient import TestClient
+
+from utils.Compression import CompressionMiddleware, EncodedBody, encoded_etag, negotiate
+
+BODY = b'{"source_code": "' + b'x' * 2000 + b'"}'
+ETAG = '"abc"'
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware)
+
+
+@app.get('/plain')
+def plain(request: Request):
+    if request.headers.get('If-None-Match'):
+        return Response(status_code=304, headers={'ETag': ETAG})
+    return Response(content=BODY, media_type='application/json', headers={'ETag': ETAG})
+
+
+@app.get('/encoded')
+def encoded(request: Request):
+    return EncodedBody(BODY).response(request, headers={'ETag': ETAG})
+
+
+client = TestClient(app)
+
+
+def test_encoded_etag():
+    assert encoded_etag(ETAG, 'gzip') == '"abc-gzip"'
+    assert encoded_etag('W/"abc"', 'br') == 'W/"abc-br"'
+    assert encoded_etag(ETAG, None) == ETAG
+
+
+def test_variants_get_their_own_etag():
+    for path in ('/plain', '/encoded'):
+        gzipped = client.get(path, headers={'Accept-Encoding': 'gzip'})
+        assert gzipped.headers['Content-Encoding'] == 'gzip'
+        assert gzipped.headers['ETag'] == '"abc-gzip"'
+
+        identity = client.get(path, headers={'Accept-Encoding': 'identity'})
+        assert 'Content-Encoding' not in identity.headers
+        assert identity.headers['ETag'] == ETAG
+
+
+def test_not_modified_echoes_the_variant_etag():
+    response = client.get(
+        '/plain', headers={'Accept-Encoding': 'gzip', 'If-None-Match': '"abc-gzip"'}
+    )
+    assert response.status_code == 304
+    assert response.headers['ETag'] == '"abc-gzip"'
+
+
+def test_brotli_and_zstd_are_preferred():
+    brotli = pytest.importorskip('brotli')
+    zstandard = pytest.importorskip('zstandard')
+
+    assert negotiate('gzip, zstd, br') == 'br'
+    assert negotiate('gzip, zstd') == 'zstd'
+
+    body, encoding = EncodedBody(BODY).encode('br')
+    assert encoding == 'br' and brotli.decompress(body) == BODY
+    body, encoding = EncodedBody(BODY).encode('zstd')
+    assert encoding == 'zstd' and zstandard.ZstdDecompressor().decompress(body) == BODY
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+from starlette.requests import Request
+
+from utils.Compression import encoded_etag
+from utils.Conditional import http_date, make_etag, not_modified
+
+CREATED_AT = datetime(2015, 10, 21, 7, 28)
+LAST_MODIFIED = http_date(CREATED_AT, None)
+ETAG = make_etag('abc', 1, CREATED_AT, None)
+
+
+def request(**headers):
+    return Request({
+        'type': 'http',
+        'method': 'GET',
+        'path': '/',
+        'headers': [
+            (name.replace('_', '-').lower().encode(), value.encode())
+            for name, value in headers.items()
+        ],
+    })
+
+
+def test_if_modified_since_with_an_unknown_zone():
+    # -0000 parses to a naive datetime
+    assert not_modified(
+        request(if_modified_since='Wed, 21 Oct 2015 07:28:00 -0000'),
+        ETAG,
+        LAST_MODIFIED
+    )
+    assert not not_modified(
+        request(if_modified_since='Wed, 21 Oct 2015 07:27:59 -0000'),
+        ETAG,
+        LAST_MODIFIED
+    )
+
+
+def test_if_modified_since_in_gmt():
+    assert not_modified(
+        request(if_modified_since='Wed, 21 Oct 2015 07:28:00 GMT'),
+        ETAG,
+        LAST_MODIFIED
+    )
+
+
+def test_invalid_if_modified_since_is_ignored():
+    assert not not_modified(request(if_modified_since='yesterday'), ETAG, LAST_MODIFIED)
+
+
+def test_if_none_match_wins():
+    assert not_modified(
+        request(if_none_match=ETAG, if_modified_since='yesterday'),
+        ETAG,
+        LAST_MODIFIED
+    )
+    assert not not_modified(
+        request(if_none_match='"other"', if_modified_since=LAST_MODIFIED),
+        ETAG,
+        LAST_MODIFIED
+    )
+
+
+def test_if_none_match_with_an_encoded_variant():
+    assert not_modified(request(if_none_match=encoded_etag(ETAG, 'gzip')), ETAG, LAST_MODIFIED)
+    assert not not_modified(
+        request(if_none_match=encoded_etag('"other"', 'gzip')), ETAG, LAST_MODIFIED
+    )
+
+
+def test_edits_within_one_second_change_the_etag(client, db, make_snippets, auth_headers):
+    from models.Snippet import Snippet
+
+    uid = make_snippets(1)[0].uid
+    url = f'/api/v1/snippets/{uid}'
+    etags = [client.get(url).headers['ETag']]
+    for title in ('first edit', 'second edit'):
+        response = client.put(url, headers=auth_headers, json={'title': title})
+        assert response.status_code == 200, response.text
+        etags.append(client.get(url).headers['ETag'])
+
+    db.expire_all()
+    assert db.query(Snippet.version).filter(Snippet.uid == uid).scalar() == 3
+    assert len(set(etags)) == 3
+    response = client.get(url, headers={'If-None-Match': etags[1]})
+    assert response.status_code == 200
+    assert response.json()['data']['snippet']['title'] == 'second edit'
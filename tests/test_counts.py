@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from sqlalchemy import delete, func, select, update
+
+from database import session_scope
+from models.Counter import PUBLIC_SNIPPETS, Counter
+from models.Snippet import Snippet
+from services import count_service
+
+
+def counter(db):
+    db.expire_all()
+    return db.scalar(select(Counter.value).where(Counter.name == PUBLIC_SNIPPETS))
+
+
+@pytest.fixture
+def public_total(db):
+    """Resets the counter to the table, the fixtures insert around it."""
+    def reset():
+        total = db.scalar(select(func.count()).select_from(Snippet).where(Snippet.visibility == 1))
+        db.execute(update(Counter).where(Counter.name == PUBLIC_SNIPPETS).values(value=total))
+        db.commit()
+    return reset
+
+
+def total(client):
+    return client.get('/api/v1/snippets').json()['data']['total']
+
+
+def test_the_counter_row_comes_with_the_table(db):
+    assert counter(db) is not None
+
+
+def test_writes_keep_the_public_total_exact(client, db, auth_headers, make_snippets, public_total):
+    make_snippets(2)
+    public_total()
+    assert total(client) == 2
+
+    response = client.post('/api/v1/snippets', headers=auth_headers, json={
+        'title': 'counted', 'source_code': 'print(1)', 'language': 'py',
+        'visibility': 1, 'theme': 'monokai',
+    })
+    assert response.status_code == 201, response.text
+    assert total(client) == 3
+    uid = db.scalar(select(Snippet.uid).where(Snippet.title == 'counted'))
+
+    response = client.put(f'/api/v1/snippets/{uid}', headers=auth_headers, json={
+        'visibility': 2, 'pass_code': 'abc123',
+    })
+    assert response.status_code == 200, response.text
+    assert total(client) == 2
+
+    response = client.put(f'/api/v1/snippets/{uid}', headers=auth_headers, json={'visibility': 1})
+    assert response.status_code == 200, response.text
+    assert client.delete(f'/api/v1/snippets/{uid}', headers=auth_headers).status_code == 204
+    assert total(client) == 2
+    assert counter(db) == 2
+
+
+def test_a_missing_row_is_counted_not_seeded(client, db, make_snippets, public_total):
+    make_snippets(3)
+    public_total()
+    db.execute(delete(Counter).where(Counter.name == PUBLIC_SNIPPETS))
+    db.commit()
+    try:
+        assert total(client) == 3
+        assert counter(db) is None
+    finally:
+        db.add(Counter(name=PUBLIC_SNIPPETS, value=3))
+        db.commit()
+
+
+def test_filtered_totals_are_capped(make_snippets, monkeypatch):
+    monkeypatch.setattr(count_service, 'count_cap', 3)
+    count_service.count_cache.clear()
+
+    async def totals():
+        async with session_scope() as db:
+            return (
+                await count_service.filtered_total(db, [Snippet.visibility == 1], 'few'),
+                await count_service.filtered_total(db, [Snippet.visibility == 2], 'many'),
+            )
+
+    make_snippets(2)
+    make_snippets(4, visibility=2)
+    assert asyncio.run(totals()) == (2, '3+')
+    count_service.count_cache.clear()
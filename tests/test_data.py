@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+PATHS = ['/api/v1/data/languages', '/api/v1/data/themes']
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_revalidation_gets_a_304(client, path):
+    response = client.get(path, headers={'Accept-Encoding': 'identity'})
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'].startswith('public, max-age=')
+    etag = response.headers['ETag']
+
+    revalidated = client.get(path, headers={'Accept-Encoding': 'identity', 'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b''
+    assert revalidated.headers['ETag'] == etag
+
+    # weak comparison and lists, as browsers and proxies send them
+    assert client.get(path, headers={'If-None-Match': f'"other", W/{etag}'}).status_code == 304
+    assert client.get(path, headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_each_encoding_has_its_own_etag(client, path):
+    identity = client.get(path, headers={'Accept-Encoding': 'identity'})
+    gzipped = client.get(path, headers={'Accept-Encoding': 'gzip'})
+
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzipped.headers['Vary'] == 'Accept-Encoding'
+    assert gzipped.headers['ETag'] != identity.headers['ETag']
+    # httpx decodes the body, both carry the same document
+    assert json.loads(gzipped.content) == json.loads(identity.content)
+    assert client.get(
+        path, headers={'Accept-Encoding': 'gzip', 'If-None-Match': gzipped.headers['ETag']}
+    ).status_code == 304
@@ -0,0 +1,22 @@
+import asyncio
+
+from sqlalchemy import select, update
+
+from database import Session, ThreadedSession
+from models.User import User
+
+
+def test_threaded_session_runs_statements_without_rows(user):
+    async def rename():
+        db = ThreadedSession(Session())
+        try:
+            result = await db.execute(
+                update(User).where(User.id == user.id).values(name='Renamed')
+            )
+            await db.commit()
+            name = await db.scalar(select(User.name).where(User.id == user.id))
+            return result.rowcount, name
+        finally:
+            await db.close()
+
+    assert asyncio.run(rename()) == (1, 'Renamed')
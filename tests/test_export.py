@@ -0,0 +1,78 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from models.Snippet import Snippet
+from models.User import User
+from services import export_service
+from utils import UID
+
+
+@pytest.fixture
+def library(db, make_snippets, monkeypatch):
+    # several server side cursor batches
+    monkeypatch.setattr(export_service, 'batch_size', 2)
+
+    snippets = make_snippets(5)
+    snippets[1].title = 'a/b: c?'
+    snippets[2].title = snippets[3].title = 'twice'
+    snippets[4].tags = 'py,demo'
+
+    other = User(name='Other', username='other', email='other@example.com', google_auth=1)
+    db.add(other)
+    db.flush()
+    db.add(Snippet(
+        uid=UID.generate(), title='not mine', source_code='secret', language='py',
+        visibility=1, theme='monokai', user_id=other.id,
+    ))
+    db.commit()
+    return snippets
+
+
+def test_ndjson_export_streams_every_snippet_in_order(client, auth_headers, library):
+    response = client.get('/api/v1/snippets/export', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'application/x-ndjson'
+    assert response.headers['Cache-Control'] == 'private, no-store'
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row['uid'] for row in rows] == [snippet.uid for snippet in library]
+    assert rows[0]['source_code'] == library[0].source_code
+    assert rows[4]['tags'] == ['py', 'demo']
+
+
+def test_ndjson_export_imports_back(client, auth_headers, library):
+    exported = client.get('/api/v1/snippets/export', headers=auth_headers).content
+
+    response = client.post(
+        '/api/v1/snippets/import',
+        headers={**auth_headers, 'Content-Type': 'application/x-ndjson'},
+        content=exported
+    )
+
+    assert response.status_code == 201, response.text
+    assert response.json()['data']['imported'] == len(library)
+
+
+def test_zip_export_has_a_file_per_snippet(client, auth_headers, library):
+    response = client.get('/api/v1/snippets/export?format=zip', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'application/zip'
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.testzip() is None
+    assert archive.namelist() == [
+        'snippet 0.py',
+        'a_b_ c_.py',
+        'twice.py',
+        f'twice-{library[3].uid}.py',
+        'snippet 4.py',
+    ]
+    assert archive.read('snippet 0.py').decode() == library[0].source_code
+
+
+def test_export_needs_a_known_format(client, auth_headers):
+    response = client.get('/api/v1/snippets/export?format=csv', headers=auth_headers)
+    assert response.status_code == 422
@@ -0,0 +1,28 @@
+from services import import_service
+
+
+def test_an_upload_too_large_midway_reports_the_saved_rows(client, auth_headers, monkeypatch):
+    async def rows():
+        for number in range(1, 4):
+            yield number, {'title': f'snippet {number}.py', 'source_code': f'print({number})'}
+        raise import_service.ImportTooLarge('Uploads are limited to 1 bytes')
+
+    monkeypatch.setattr(import_service, 'batch_size', 2)
+    monkeypatch.setattr(import_service, 'rows_of', lambda request: rows())
+
+    response = client.post('/api/v1/snippets/import', headers=auth_headers)
+
+    assert response.status_code == 413
+    report = response.json()['data']
+    assert report['imported'] == 2
+    assert report['failed'] == 1
+    assert report['errors'] == [{'row': 3, 'detail': 'Not saved: Uploads are limited to 1 bytes'}]
+
+
+def test_an_unsupported_upload_has_no_report(client, auth_headers):
+    response = client.post(
+        '/api/v1/snippets/import', headers={**auth_headers, 'Content-Type': 'image/png'}
+    )
+
+    assert response.status_code == 415
+    assert 'data' not in response.json()
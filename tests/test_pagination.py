@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import text
+
+
+@pytest.fixture
+def listed(db, make_snippets):
+    snippets = make_snippets(7)
+    # stored the way CURRENT_TIMESTAMP writes it, two rows per second and
+    # one alone, ties are broken by id
+    for i, snippet in enumerate(snippets):
+        db.execute(
+            text('UPDATE snippets SET created_at = :created_at WHERE id = :id'),
+            {'created_at': f'2023-05-01 12:00:0{i // 2}', 'id': snippet.id}
+        )
+    db.commit()
+    # newest first
+    return [snippet.uid for snippet in reversed(snippets)]
+
+
+def walk(client, url, headers=None):
+    uids = []
+    cursor = None
+    for _ in range(20):
+        page_url = url if cursor is None else f'{url}&cursor={cursor}'
+        data = client.get(page_url, headers=headers).json()['data']
+        uids += [snippet['uid'] for snippet in data['snippets']]
+        cursor = data['next_cursor']
+        if cursor is None:
+            return uids
+    raise AssertionError(f'cursor did not advance: {uids}')
+
+
+def test_cursor_walks_every_public_page(client, listed):
+    assert walk(client, '/api/v1/snippets?limit=2') == listed
+
+
+def test_cursor_walks_every_page_of_your_snippets(client, listed, auth_headers):
+    assert walk(client, '/api/v1/snippets/my?limit=3', auth_headers) == listed
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=1000', 'page=0', 'page=-1'])
+def test_bad_paging_is_rejected(client, auth_headers, query):
+    assert client.get(f'/api/v1/snippets?{query}').status_code == 422
+    assert client.get(f'/api/v1/snippets/my?{query}', headers=auth_headers).status_code == 422
@@ -0,0 +1,61 @@
+import pytest
+
+from utils.QueryCounter import QueryCounter, assert_max_queries
+
+# the listings run one query for the page whatever its size, index adds one
+# for the total from the counters table
+INDEX_QUERIES = 2
+MY_SNIPPETS_QUERIES = 1
+
+
+def count_queries(client, url, headers=None):
+    with QueryCounter() as counter:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    return counter.count
+
+
+@pytest.mark.parametrize('count', [1, 10, 25])
+def test_index_runs_a_fixed_number_of_queries(client, make_snippets, count):
+    make_snippets(count)
+    # warms the caches
+    client.get('/api/v1/snippets?limit=50')
+
+    with assert_max_queries(INDEX_QUERIES):
+        response = client.get('/api/v1/snippets?limit=50')
+
+    assert response.status_code == 200
+    assert len(response.json()['data']['snippets']) == count
+
+
+@pytest.mark.parametrize('count', [1, 10, 25])
+def test_my_snippets_runs_a_fixed_number_of_queries(
+    client, make_snippets, auth_headers, count
+):
+    make_snippets(count, visibility=2)
+    # caches the user, the lookup isn't part of the listing
+    client.get('/api/v1/snippets/my?limit=50', headers=auth_headers)
+
+    with assert_max_queries(MY_SNIPPETS_QUERIES):
+        response = client.get('/api/v1/snippets/my?limit=50', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert len(response.json()['data']['snippets']) == count
+
+
+def test_listing_queries_dont_grow_with_the_page(client, make_snippets, auth_headers):
+    make_snippets(2)
+    client.get('/api/v1/snippets?limit=50')
+    client.get('/api/v1/snippets/my?limit=50', headers=auth_headers)
+    few = (
+        count_queries(client, '/api/v1/snippets?limit=50'),
+        count_queries(client, '/api/v1/snippets/my?limit=50', auth_headers),
+    )
+
+    make_snippets(30)
+    many = (
+        count_queries(client, '/api/v1/snippets?limit=50'),
+        count_queries(client, '/api/v1/snippets/my?limit=50', auth_headers),
+    )
+
+    assert few == many
@@ -0,0 +1,30 @@
+import pytest
+
+from lib.data.languages import languages as language_list
+from lib.registry import build_index, get_language, get_theme, languages, themes
+
+
+def test_duplicate_keys_fail_the_build():
+    with pytest.raises(ValueError, match="Duplicate ext 'm' in reference data: MATLAB and Objective-C"):
+        build_index([
+            {'name': 'MATLAB', 'ext': 'm'},
+            {'name': 'Objective-C', 'ext': 'm'},
+        ], 'ext')
+
+
+def test_the_shipped_data_has_unique_keys():
+    assert len(languages) == len(language_list)
+    assert len({language['ext'] for language in languages}) == len(languages)
+    assert len({theme['value'] for theme in themes}) == len(themes)
+
+
+def test_lookups():
+    assert get_language('py')['name'] == 'Python'
+    assert get_language('nope') is None
+    assert get_theme('monokai') is not None
+    assert get_theme('nope') is None
+
+
+def test_the_index_is_read_only():
+    with pytest.raises(TypeError):
+        get_language('py')['name'] = 'Snake'
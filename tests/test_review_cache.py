@@ -0,0 +1,120 @@
+import pytest
+
+from database import engine
+from services import review_cache
+
+
+@pytest.fixture
+def reviewer(db, monkeypatch):
+    """Stands in for the review service, records the connections held during each call."""
+    from models.ReviewCache import ReviewCache
+
+    review_cache.memory_cache.clear()
+    checked_out = []
+
+    async def review_code_with_engine(source_code, language=None):
+        checked_out.append(engine.pool.checkedout())
+        if 'boom' in source_code:
+            raise RuntimeError('Review failed')
+        return f'review of {source_code}', 'remote'
+
+    monkeypatch.setattr(review_cache, 'review_code_with_engine', review_code_with_engine)
+    yield checked_out
+    db.query(ReviewCache).delete()
+    db.commit()
+    review_cache.memory_cache.clear()
+
+
+def test_review_holds_no_connection_while_reviewing(client, reviewer):
+    response = client.post('/api/v1/snippets/review', json={'source_code': 'print(1)'})
+    assert response.json()['data'] == {'message': 'review of print(1)', 'cached': False}
+    assert reviewer == [0]
+
+    # served from the cache, also from the table once memory forgot it
+    review_cache.memory_cache.clear()
+    response = client.post('/api/v1/snippets/review', json={'source_code': 'print(1)'})
+    assert response.json()['data']['cached'] is True
+    assert reviewer == [0]
+
+
+def test_batch_holds_no_connection_while_reviewing(client, reviewer):
+    response = client.post('/api/v1/snippets/review/batch', json={'items': [
+        {'source_code': 'print(1)'},
+        {'source_code': 'print(2)'},
+    ]})
+    assert response.status_code == 200
+    assert reviewer == [0, 0]
+
+
+def test_batch_reports_errors_per_item_in_order(client, reviewer, make_snippets):
+    public = make_snippets(1)[0]
+    private = make_snippets(1, visibility=2)[0]
+
+    response = client.post('/api/v1/snippets/review/batch', json={'items': [
+        {'source_code': 'print(1)'},
+        {},
+        {'source_code': 'print(1)', 'uid': public.uid},
+        {'uid': 'missing'},
+        {'uid': private.uid},
+        {'source_code': '   '},
+        {'source_code': 'boom()'},
+        {'uid': public.uid},
+        {'source_code': 'print(1)'},
+    ]})
+
+    assert response.status_code == 200
+    assert response.json()['data']['results'] == [
+        {'message': 'review of print(1)', 'cached': False},
+        {'error': 'Provide either source_code or uid'},
+        {'error': 'Provide either source_code or uid', 'uid': public.uid},
+        {'error': 'Snippet not found', 'uid': 'missing'},
+        {'error': 'This is a private snippet', 'uid': private.uid},
+        {'error': 'Source code cannot be blank'},
+        {'error': 'Review failed'},
+        {'message': f'review of {public.source_code}', 'cached': False, 'uid': public.uid},
+        {'message': 'review of print(1)', 'cached': False},
+    ]
+    # the duplicate source went to the reviewer once
+    assert len(reviewer) == 3
+
+
+def test_batch_size_is_limited(client, reviewer, monkeypatch):
+    from routers import snippets
+
+    monkeypatch.setattr(snippets, 'review_batch_max_items', 2)
+    response = client.post('/api/v1/snippets/review/batch', json={'items': [
+        {'source_code': 'print(1)'}, {'source_code': 'print(2)'}, {'source_code': 'print(3)'},
+    ]})
+
+    assert response.status_code == 422
+    assert reviewer == []
+
+
+def test_batch_fan_out_is_bounded(db, monkeypatch):
+    import asyncio
+
+    from database import session_scope
+
+    review_cache.memory_cache.clear()
+    running = []
+    peak = []
+
+    async def review_code_with_engine(source_code, language=None):
+        running.append(source_code)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(source_code)
+        return source_code, 'local'
+
+    monkeypatch.setattr(review_cache, 'review_code_with_engine', review_code_with_engine)
+
+    async def run():
+        async with session_scope() as session:
+            return await review_cache.review_many(
+                session, [(f'print({i})', 'py') for i in range(10)], 3
+            )
+
+    results = asyncio.run(run())
+
+    assert [message for message, _, _ in results] == [f'print({i})' for i in range(10)]
+    assert max(peak) == 3
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from services.review_jobs import DONE, FAILED, QUEUED, InProcessJobQueue, ReviewJobQueue
+
+
+def test_the_interface_cant_be_instantiated():
+    with pytest.raises(TypeError):
+        ReviewJobQueue()
+
+
+def test_events_end_when_the_job_expires():
+    queue = InProcessJobQueue(poll_interval=0.01)
+    queue.jobs.set('job', {'id': 'job', 'status': QUEUED})
+
+    async def collect():
+        events = []
+        async for job in queue.events('job'):
+            events.append(job)
+            if len(events) == 1:
+                queue.jobs.invalidate('job')
+        return events
+
+    events = asyncio.run(asyncio.wait_for(collect(), 5))
+
+    assert [job['status'] for job in events] == [QUEUED, FAILED]
+    assert events[-1]['error'] == 'Review job expired'
+    assert queue.subscribers == {}
+
+
+def test_workers_hold_no_connection_while_reviewing(db, monkeypatch):
+    from database import engine
+    from models.ReviewCache import ReviewCache
+    from services import review_cache
+
+    review_cache.memory_cache.clear()
+    checked_out = []
+
+    async def review_code_with_engine(source_code, language=None):
+        checked_out.append(engine.pool.checkedout())
+        return 'looks fine', 'remote'
+
+    monkeypatch.setattr(review_cache, 'review_code_with_engine', review_code_with_engine)
+
+    async def run():
+        queue = InProcessJobQueue(workers=1)
+        await queue.start()
+        try:
+            job = await queue.submit('print(1)', 'py')
+            async for job in queue.events(job['id']):
+                pass
+            return job
+        finally:
+            await queue.stop()
+
+    job = asyncio.run(asyncio.wait_for(run(), 5))
+
+    assert job['status'] == DONE
+    assert job['result'] == 'looks fine'
+    assert checked_out == [0]
+    # stored through its own short session
+    review_cache.memory_cache.clear()
+    assert asyncio.run(review_cache.review_detached('print(1)', 'py')) == ('looks fine', True)
+
+    db.query(ReviewCache).delete()
+    db.commit()
+    review_cache.memory_cache.clear()
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from sqlalchemy.dialects import mysql, postgresql
+
+from database import session_scope
+from services import search_service
+from services.search_service import InvertedIndex
+
+
+@pytest.fixture
+def index(db, monkeypatch):
+    """A fresh in-process index, built from the database like at startup."""
+    monkeypatch.setattr(search_service, 'inverted_index', InvertedIndex())
+
+    async def build():
+        async with session_scope() as session:
+            await search_service.build_inverted_index(session)
+
+    return lambda: asyncio.run(build())
+
+
+def test_exact_terms_rank_above_prefixes():
+    index = InvertedIndex()
+    index.add(1, 'parser', None, 1, 1)
+    index.add(2, 'parse tree', 'parse', 1, 1)
+    index.add(3, 'unrelated', None, 1, 1)
+
+    scores = index.search('parse')
+    assert set(scores) == {1, 2}
+    assert scores[2] > scores[1]
+    # every term has to match
+    assert set(index.search('parse tree')) == {2}
+
+
+def test_search_only_scores_visible_snippets():
+    index = InvertedIndex()
+    index.add(1, 'hello', None, 1, 7)
+    index.add(2, 'hello', None, 2, 7)
+    index.add(3, 'hello', None, 2, 8)
+
+    assert set(index.search('hello')) == {1}
+    assert set(index.search('hello', user_id=7)) == {1, 2}
+
+    index.add(1, 'hello', None, 2, 7)
+    assert index.search('hello') == {}
+
+
+def test_private_matches_dont_crowd_out_public_ones(client, make_snippets, index, monkeypatch):
+    monkeypatch.setattr(search_service, 'max_matches', 2)
+    make_snippets(5, visibility=2)
+    public = make_snippets(2)
+    index()
+
+    data = client.get('/api/v1/snippets?q=snippet').json()['data']
+
+    assert {snippet['uid'] for snippet in data['snippets']} == {s.uid for s in public}
+    assert data['total'] == 2
+
+
+def test_listings_rank_by_score(client, db, make_snippets, index, auth_headers):
+    weak, strong = make_snippets(2)
+    weak.title = 'hello worldwide'
+    strong.title = 'hello world'
+    db.commit()
+    index()
+
+    public = client.get('/api/v1/snippets?q=hello world').json()['data']['snippets']
+    mine = client.get('/api/v1/snippets/my?q=hello world', headers=auth_headers).json()['data']['snippets']
+
+    assert [snippet['uid'] for snippet in public] == [strong.uid, weak.uid]
+    assert [snippet['uid'] for snippet in mine] == [strong.uid, weak.uid]
+
+
+def test_new_snippets_are_searchable(client, auth_headers, index):
+    index()
+    response = client.post('/api/v1/snippets', headers=auth_headers, json={
+        'title': 'fresh snippet',
+        'source_code': 'print(1)',
+        'language': 'py',
+        'visibility': 1,
+        'theme': 'monokai',
+    })
+    assert response.status_code == 201, response.text
+
+    snippets = client.get('/api/v1/snippets?q=fresh').json()['data']['snippets']
+    assert [snippet['title'] for snippet in snippets] == ['fresh snippet']
+
+
+def compiled(monkeypatch, dialect_name, dialect, q):
+    monkeypatch.setattr(search_service, 'dialect', dialect_name)
+    condition, rank = search_service.search_condition(q)
+    return str(condition.compile(dialect=dialect)), rank
+
+
+def test_mysql_matches_short_terms_with_like(monkeypatch):
+    sql, rank = compiled(monkeypatch, 'mysql', mysql.dialect(), 'py parser')
+    assert 'MATCH (snippets.title, snippets.tags) AGAINST' in sql
+    assert 'lower(snippets.title) LIKE lower(' in sql
+    assert rank is not None
+
+    # only short terms, nothing for the full-text index
+    sql, rank = compiled(monkeypatch, 'mysql', mysql.dialect(), 'py')
+    assert 'MATCH' not in sql
+    assert rank is None
+
+
+def test_postgres_matches_prefixes(monkeypatch):
+    sql, rank = compiled(monkeypatch, 'postgresql', postgresql.dialect(), 'py parser')
+    assert 'to_tsquery' in sql
+    assert rank is not None
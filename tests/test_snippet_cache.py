@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from services import snippet_cache
+
+PAYLOAD = {'snippet': {'uid': 'abc'}, 'etag': '"1"', 'last_modified': '', 'public': True}
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    backend = snippet_cache.MemoryBackend()
+    monkeypatch.setattr(snippet_cache, 'shared', backend)
+    for cache in (snippet_cache.local_cache, snippet_cache.body_cache, snippet_cache.tombstones):
+        cache.clear()
+    return backend
+
+
+def test_a_put_racing_an_invalidate_is_dropped(shared):
+    async def race():
+        # loaded before the write, put after its invalidation
+        await snippet_cache.invalidate('abc')
+        await snippet_cache.put('abc', PAYLOAD)
+        return await snippet_cache.get('abc')
+
+    assert asyncio.run(race()) is None
+
+
+def test_other_workers_see_the_tombstone(shared):
+    async def race():
+        await snippet_cache.invalidate('abc')
+        # another worker: nothing local, only the shared tier
+        snippet_cache.tombstones.clear()
+        await snippet_cache.put('abc', PAYLOAD)
+        snippet_cache.local_cache.clear()
+        return await snippet_cache.get('abc')
+
+    assert asyncio.run(race()) is None
+
+
+def test_puts_work_again_once_the_tombstone_expires(shared):
+    async def run():
+        await snippet_cache.invalidate('abc')
+        # both tombstones expired
+        snippet_cache.tombstones.clear()
+        shared.data.invalidate('abc')
+        await snippet_cache.put('abc', PAYLOAD)
+        return await snippet_cache.get('abc')
+
+    assert asyncio.run(run()) == PAYLOAD
+
+
+def test_invalidate_survives_a_failing_shared_tier(shared, monkeypatch):
+    async def broken(key, ttl):
+        raise ConnectionError('redis is down')
+
+    monkeypatch.setattr(shared, 'tombstone', broken)
+    snippet_cache.local_cache.set('abc', PAYLOAD)
+
+    asyncio.run(snippet_cache.invalidate('abc'))
+
+    assert snippet_cache.local_cache.get('abc') is None
+
+
+def test_a_miss_is_filled_from_a_replica_read(shared, client, make_snippets, monkeypatch):
+    from routers import snippets
+
+    validate_snippet = snippets.validate_snippet
+    pinned = []
+
+    async def validate_on(request, uid, user, db):
+        pinned.append(db.info.get('primary', False))
+        return await validate_snippet(request, uid, user, db)
+
+    monkeypatch.setattr(snippets, 'validate_snippet', validate_on)
+    snippet = make_snippets(1)[0]
+
+    assert client.get(f'/api/v1/snippets/{snippet.uid}').status_code == 200
+    assert pinned == [False]
+    assert asyncio.run(snippet_cache.get(snippet.uid)) is not None
+
+
+def test_a_sticky_user_reads_the_primary_and_fills_nothing(
+    shared, client, make_snippets, user, auth_headers, monkeypatch
+):
+    from database import sticky_users
+    from routers import snippets
+
+    validate_snippet = snippets.validate_snippet
+    pinned = []
+
+    async def validate_on(request, uid, user, db):
+        pinned.append(db.info.get('primary', False))
+        return await validate_snippet(request, uid, user, db)
+
+    monkeypatch.setattr(snippets, 'validate_snippet', validate_on)
+    snippet = make_snippets(1)[0]
+    sticky_users.set(user.email, True)
+    try:
+        response = client.get(f'/api/v1/snippets/{snippet.uid}', headers=auth_headers)
+    finally:
+        sticky_users.invalidate(user.email)
+
+    assert response.status_code == 200
+    assert pinned == [True]
+    assert asyncio.run(snippet_cache.get(snippet.uid)) is None
+
+
+def test_local_copies_are_short_lived_without_a_cross_process_backend(shared, monkeypatch):
+    assert snippet_cache.local_ttl() == snippet_cache.unshared_ttl
+
+    monkeypatch.setattr(snippet_cache, 'shared', None)
+    assert snippet_cache.local_ttl() == snippet_cache.unshared_ttl
+
+    monkeypatch.setattr(shared, 'cross_process', True, raising=False)
+    monkeypatch.setattr(snippet_cache, 'shared', shared)
+    assert snippet_cache.local_ttl() == snippet_cache.cache_ttl
+
+
+def test_the_listener_resubscribes_and_drops_what_it_missed(shared, monkeypatch):
+    attempts = []
+    listen = shared.listen
+
+    async def flaky(on_invalidate, on_subscribe):
+        attempts.append(True)
+        if len(attempts) == 1:
+            raise ConnectionError('connection lost')
+        await listen(on_invalidate, on_subscribe)
+
+    monkeypatch.setattr(shared, 'listen', flaky)
+    monkeypatch.setattr(snippet_cache, 'listen_retry', 0.01)
+
+    async def run():
+        snippet_cache.local_cache.set('abc', PAYLOAD)
+        await snippet_cache.start()
+        try:
+            for _ in range(100):
+                if shared.listeners:
+                    break
+                await asyncio.sleep(0.01)
+            # a copy invalidated while the feed was down is gone too
+            stale = snippet_cache.local_cache.get('abc')
+            await shared.tombstone('xyz', 10)
+            return stale, snippet_cache.tombstones.get('xyz')
+        finally:
+            await snippet_cache.stop()
+
+    assert asyncio.run(run()) == (None, True)
+    assert len(attempts) == 2
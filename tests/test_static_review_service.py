@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from services import static_review_service
+
+
+def test_analysis_names_the_language():
+    message = static_review_service.analyze('x = 1 \nprint(x)\n', 'py')
+    assert message.startswith('Static analysis (Python)')
+
+
+def test_replacing_a_hung_pool_terminates_its_workers():
+    pool = static_review_service.get_pool()
+    # a worker stuck outside run_analysis' own time limit
+    pool.submit(time.sleep, 60)
+    processes = list(pool._processes.values())
+    assert processes
+
+    static_review_service.shutdown(terminate_workers=True)
+
+    deadline = time.monotonic() + 10
+    while any(process.is_alive() for process in processes):
+        assert time.monotonic() < deadline, 'workers still running'
+        time.sleep(0.05)
+    assert static_review_service.pool is None
+
+
+def test_review_code_runs_in_the_pool():
+    try:
+        message = asyncio.run(static_review_service.review_code('print(1)\n', 'py'))
+    finally:
+        static_review_service.shutdown()
+
+    assert 'Static analysis' in message
+
+
+def test_a_hung_analysis_leaves_the_others_running(monkeypatch):
+    monkeypatch.setattr(static_review_service, 'hang_timeout', 1)
+
+    async def run():
+        executor = static_review_service.get_pool()
+        loop = asyncio.get_running_loop()
+        healthy = loop.run_in_executor(executor, time.sleep, 0.5)
+        loop.run_in_executor(executor, time.sleep, 60)
+        processes = list(executor._processes.values())
+
+        # two callers failing on the same pool replace it once
+        static_review_service.retire(executor)
+        replacement = static_review_service.get_pool()
+        static_review_service.retire(executor)
+        assert static_review_service.pool is replacement
+
+        await healthy
+        # the hung one is killed after hang_timeout
+        await asyncio.sleep(1.5)
+        return processes
+
+    try:
+        processes = asyncio.run(run())
+        deadline = time.monotonic() + 10
+        while any(process.is_alive() for process in processes):
+            assert time.monotonic() < deadline, 'workers still running'
+            time.sleep(0.05)
+        assert static_review_service.retired == []
+    finally:
+        static_review_service.shutdown()
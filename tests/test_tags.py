@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from database import engine, session_scope
+from migrations import m006_snippet_tags
+from models.Tag import Tag, snippet_tags
+from services import tag_service
+
+
+@pytest.fixture
+def tagged(db, make_snippets, monkeypatch):
+    """Snippets with only the comma joined tags, linked by the m006 backfill."""
+    both = make_snippets(1, tags='python,Web')[0]
+    python = make_snippets(1, tags=' python ')[0]
+    rust = make_snippets(1, tags='rust')[0]
+    make_snippets(1)
+
+    monkeypatch.setattr(m006_snippet_tags, 'batch_size', 2)
+    with engine.connect() as connection:
+        m006_snippet_tags.upgrade(connection)
+    return both, python, rust
+
+
+def listed(client, query):
+    response = client.get(f'/api/v1/snippets?{query}')
+    if response.status_code == 404:
+        return set()
+    assert response.status_code == 200, response.text
+    return {snippet['uid'] for snippet in response.json()['data']['snippets']}
+
+
+def test_backfill_links_every_tag_once(db, tagged):
+    assert sorted(db.scalars(select(Tag.name))) == ['python', 'rust', 'web']
+    assert db.scalar(select(func.count()).select_from(snippet_tags)) == 4
+
+    # a rerun finds everything linked already
+    with engine.connect() as connection:
+        m006_snippet_tags.upgrade(connection)
+    assert db.scalar(select(func.count()).select_from(snippet_tags)) == 4
+
+
+def test_tag_filter_matches_all_or_any(client, tagged):
+    both, python, rust = tagged
+
+    assert listed(client, 'tag=python') == {both.uid, python.uid}
+    assert listed(client, 'tag=python&tag=web') == {both.uid}
+    assert listed(client, 'tag=python,web') == {both.uid}
+    assert listed(client, 'tag=web&tag=rust&tag_match=any') == {both.uid, rust.uid}
+    # names are normalized like stored tags
+    assert listed(client, 'tag=%20WEB%20') == {both.uid}
+    assert listed(client, 'tag=python&tag=go') == set()
+
+
+def test_tag_filter_counts_its_total(client, tagged):
+    response = client.get('/api/v1/snippets?tag=python')
+    assert response.json()['data']['total'] == 2
+
+
+def test_tag_match_must_be_all_or_any(client):
+    assert client.get('/api/v1/snippets?tag=python&tag_match=some').status_code == 422
+
+
+def test_writes_relink_tags(client, auth_headers, tagged):
+    response = client.post('/api/v1/snippets', headers=auth_headers, json={
+        'title': 'tagged', 'source_code': 'print(1)', 'language': 'py',
+        'tags': ['Go', 'web'], 'visibility': 1, 'theme': 'monokai',
+    })
+    assert response.status_code == 201, response.text
+    uid = response.json()['data']['snippet']['uid']
+    assert uid in listed(client, 'tag=go&tag=web')
+
+    response = client.put(f'/api/v1/snippets/{uid}', headers=auth_headers, json={'tags': ['rust']})
+    assert response.status_code == 200, response.text
+    assert uid not in listed(client, 'tag=go')
+    assert uid in listed(client, 'tag=rust')
+
+
+def test_tag_ids_creates_only_the_missing_tags(db):
+    async def ids(names):
+        async with session_scope() as session:
+            result = await tag_service.tag_ids(session, names)
+            await session.commit()
+            return result
+
+    first = asyncio.run(ids(['python', 'web']))
+    second = asyncio.run(ids(['web', 'rust']))
+
+    assert second['web'] == first['web']
+    assert set(second) == {'web', 'rust'}
+    assert db.scalar(select(func.count()).select_from(Tag)) == 3
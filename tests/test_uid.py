@@ -0,0 +1,53 @@
+import multiprocessing
+import threading
+
+from utils import UID
+
+PROCESSES = 4
+IDS_PER_PROCESS = 20000
+
+
+def generate_in_worker(worker_id):
+    # spawned, so the worker id is set before anything generates
+    import os
+
+    os.environ['UID_WORKER_ID'] = str(worker_id)
+    from utils import UID
+
+    UID._pick_worker_id()
+    return [UID.generate() for _ in range(IDS_PER_PROCESS)]
+
+
+def test_ids_are_unique_across_processes():
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(PROCESSES) as pool:
+        batches = pool.map(generate_in_worker, range(PROCESSES))
+
+    ids = [uid for batch in batches for uid in batch]
+    assert len(ids) == PROCESSES * IDS_PER_PROCESS
+    assert len(set(ids)) == len(ids)
+
+
+def test_ids_are_unique_across_threads():
+    batches = [[] for _ in range(8)]
+
+    def generate(batch):
+        batch.extend(UID.generate() for _ in range(5000))
+
+    threads = [threading.Thread(target=generate, args=(batch,)) for batch in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = [uid for batch in batches for uid in batch]
+    assert len(set(ids)) == len(ids)
+
+
+def test_ids_are_fixed_length_and_time_ordered():
+    ids = [UID.generate() for _ in range(10000)]
+
+    assert all(len(uid) == UID.LENGTH for uid in ids)
+    assert all(char in UID.ALPHABET for uid in ids for char in uid)
+    # one process, one worker id: base62 order is generation order
+    assert ids == sorted(ids)
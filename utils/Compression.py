@@ -0,0 +1,183 @@
+import gzip
+from os import environ
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional, br is just not offered without it
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, zstd is just not offered without it
+    zstandard = None
+
+minimum_size = int(environ.get('COMPRESSION_MIN_SIZE', 500))
+compression_level = int(environ.get('COMPRESSION_LEVEL', 6))
+
+compressible_types = (
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+    'text/',
+)
+
+# levels above what an encoder supports are clamped, so this is the best of each
+max_level = 19
+
+# encoders by preference, only the ones whose package is installed
+encoders = {}
+if brotli is not None:
+    encoders['br'] = lambda body, level: brotli.compress(body, quality=min(level, 11))
+if zstandard is not None:
+    encoders['zstd'] = lambda body, level: zstandard.ZstdCompressor(level=level).compress(body)
+encoders['gzip'] = lambda body, level: gzip.compress(body, compresslevel=min(level, 9), mtime=0)
+
+
+def accepted_encodings(accept_encoding):
+    """Encodings an Accept-Encoding header accepts, the ones sent with q=0 are dropped."""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        encoding, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if encoding and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(encoding.lower())
+    return accepted
+
+
+def negotiate(accept_encoding):
+    """Best encoding both sides support, None for identity."""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in encoders:
+        if encoding in accepted or '*' in accepted:
+            return encoding
+    return None
+
+
+def compress(body, encoding, level=None):
+    return encoders[encoding](body, compression_level if level is None else level)
+
+
+def is_compressible(content_type):
+    return content_type.startswith(compressible_types)
+
+
+def encoded_etag(etag, encoding):
+    """ETag of an encoded variant, a strong ETag names one representation."""
+    if encoding is None or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def etag_variants(etag):
+    """The ETag and the ones of its encoded variants, any of them validates."""
+    return {etag} | {encoded_etag(etag, encoding) for encoding in encoders}
+
+
+class EncodedBody:
+    """
+    Serialized response body kept in a cache, each compressed variant is
+    made on the first request asking for that encoding and reused after.
+    """
+
+    def __init__(self, body):
+        self.body = body
+        self.variants = {}
+
+    def encode(self, encoding):
+        if encoding is None or len(self.body) < minimum_size:
+            return self.body, None
+
+        variant = self.variants.get(encoding)
+        if variant is None:
+            variant = self.variants[encoding] = compress(self.body, encoding)
+        return variant, encoding
+
+    def response(self, request, status_code=200, headers=None, media_type='application/json'):
+        body, encoding = self.encode(negotiate(request.headers.get('Accept-Encoding')))
+
+        headers = dict(headers or {})
+        headers['Vary'] = 'Accept-Encoding'
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+            if 'ETag' in headers:
+                headers['ETag'] = encoded_etag(headers['ETag'], encoding)
+
+        return Response(
+            content=body,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type
+        )
+
+
+class CompressionMiddleware:
+    """
+    Compresses complete (non streaming) responses with the best encoding the
+    client accepts. Responses already carrying a Content-Encoding, like the
+    precomputed ones, go through untouched.
+    """
+
+    def __init__(self, app, minimum_size=minimum_size):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(request_headers.get('Accept-Encoding'))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message['type'] == 'http.response.start':
+                start_message = message
+                return
+
+            headers = MutableHeaders(raw=start_message['headers'])
+            body = message.get('body', b'')
+
+            if start_message['status'] == 304 and 'ETag' in headers:
+                # revalidated the encoded variant, answer with its ETag
+                etag = encoded_etag(headers['ETag'], encoding)
+                if etag in request_headers.get('If-None-Match', ''):
+                    headers['ETag'] = etag
+
+            if (
+                message.get('more_body', False)
+                or 'Content-Encoding' in headers
+                or not is_compressible(headers.get('Content-Type', ''))
+                or len(body) < self.minimum_size
+            ):
+                # streamed, already encoded, or not worth it
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            headers['Content-Encoding'] = encoding
+            headers['Content-Length'] = str(len(body))
+            if 'ETag' in headers:
+                headers['ETag'] = encoded_etag(headers['ETag'], encoding)
+            headers.add_vary_header('Accept-Encoding')
+            await send(start_message)
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self.app(scope, receive, send_compressed)
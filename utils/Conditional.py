@@ -0,0 +1,66 @@
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import sha256
+
+from fastapi import Request, status
+from fastapi.responses import Response
+
+from utils.Compression import etag_variants
+from utils.Precomputed import etag_matches
+
+
+# validators of a snippet version, changes whenever the row is updated
+def make_etag(uid, version, created_at, updated_at):
+    changed_at = updated_at or created_at
+    digest = sha256(f'{uid}:{version}:{changed_at.isoformat()}'.encode()).hexdigest()[:24]
+    return f'"{digest}"'
+
+
+def http_date(created_at, updated_at):
+    # timestamps are stored in UTC without a zone
+    version = (updated_at or created_at).replace(tzinfo=timezone.utc)
+    return format_datetime(version, usegmt=True)
+
+
+def is_conditional(request: Request):
+    headers = request.headers
+    return 'If-None-Match' in headers or 'If-Modified-Since' in headers
+
+
+def not_modified(request: Request, etag, last_modified):
+    # If-None-Match wins over If-Modified-Since when both are sent
+    if 'If-None-Match' in request.headers:
+        # a client holding a compressed variant sends back its suffixed ETag
+        return etag_matches(request, etag_variants(etag))
+
+    if_modified_since = request.headers.get('If-Modified-Since')
+    if not if_modified_since:
+        return False
+
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # a -0000 zone parses naive, the dates are UTC either way
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+
+    try:
+        return parsedate_to_datetime(last_modified) <= since
+    except TypeError:
+        return False
+
+
+def validator_headers(etag, last_modified, public=True):
+    return {
+        'ETag': etag,
+        'Last-Modified': last_modified,
+        'Cache-Control': 'no-cache' if public else 'private, no-cache',
+    }
+
+
+def not_modified_response(etag, last_modified, public=True):
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=validator_headers(etag, last_modified, public)
+    )
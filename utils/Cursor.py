@@ -0,0 +1,18 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+
+# opaque keyset cursor for the listings, points right after (created_at, id)
+def encode(created_at, id):
+    payload = json.dumps([created_at.isoformat(), id], separators=(',', ':'))
+    return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, id = json.loads(urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(id)
+    except Exception:
+        raise ValueError('Invalid cursor')
@@ -0,0 +1,78 @@
+import json
+from hashlib import sha256
+from os import environ
+
+from fastapi import Request, status
+from fastapi.responses import Response
+
+from utils.Compression import compress, encoded_etag, encoders, max_level, negotiate
+
+cache_max_age = int(environ.get('STATIC_CACHE_MAX_AGE', 86400))
+
+
+def etag_matches(request: Request, etags):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == '*':
+        return True
+
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate in etags:
+            return True
+    return False
+
+
+class PrecomputedJSON:
+    """
+    JSON body of a response whose content never changes while the app runs,
+    encoded and compressed once at startup. Served with a strong ETag per
+    encoding and a long Cache-Control, revalidations get a 304.
+    """
+
+    def __init__(self, content, max_age=None):
+        body = json.dumps(content, separators=(',', ':')).encode()
+        digest = sha256(body).hexdigest()[:32]
+
+        # encoding -> (body, etag), identity is the uncompressed body
+        etag = f'"{digest}"'
+        self.variants = {'identity': (body, etag)}
+        for encoding in encoders:
+            self.variants[encoding] = (
+                compress(body, encoding, level=max_level),
+                encoded_etag(etag, encoding)
+            )
+        self.etags = {etag for _, etag in self.variants.values()}
+        self.cache_control = (
+            f'public, max-age={cache_max_age if max_age is None else max_age}'
+        )
+
+    def response(self, request: Request):
+        encoding = negotiate(request.headers.get('Accept-Encoding')) or 'identity'
+        body, etag = self.variants[encoding]
+
+        headers = {
+            'ETag': etag,
+            'Cache-Control': self.cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+
+        if etag_matches(request, self.etags):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers=headers
+            )
+
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+
+        return Response(
+            content=body,
+            status_code=status.HTTP_200_OK,
+            headers=headers,
+            media_type='application/json'
+        )
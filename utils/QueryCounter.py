@@ -0,0 +1,56 @@
+from sqlalchemy import event
+
+from database import engine as default_engine
+
+
+class QueryCounter:
+    """
+    Records every SQL statement sent through an engine while active, counts
+    all connections of the engine so use it where nothing else is running:
+
+        with QueryCounter() as counter:
+            ...
+        counter.count
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine if engine is not None else default_engine
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+        return False
+
+
+class assert_max_queries(QueryCounter):
+    """
+    Fails with an AssertionError when the block runs more than max_count
+    statements, e.g. to keep a listing from regressing into N+1 queries:
+
+        with assert_max_queries(3):
+            client.get('/api/v1/snippets')
+    """
+
+    def __init__(self, max_count, engine=None):
+        super().__init__(engine)
+        self.max_count = max_count
+
+    def __exit__(self, exc_type, exc, traceback):
+        super().__exit__(exc_type, exc, traceback)
+        if exc_type is None and self.count > self.max_count:
+            raise AssertionError(
+                f'Expected at most {self.max_count} queries, ran {self.count}:\n'
+                + '\n'.join(self.statements)
+            )
+        return False
@@ -1,13 +1,70 @@
-from uuid import uuid4
-from database import db
-from models.Snippet import Snippet
+import os
+import random
+import time
+from threading import Lock
+
+# 10 char, time ordered base62 ids, no lookup needed:
+# 41 bits of milliseconds since EPOCH_MS | 10 bits worker | 8 bits sequence
+EPOCH_MS = 1672531200000  # 2023-01-01T00:00:00Z
+WORKER_BITS = 10
+SEQUENCE_BITS = 8
+LENGTH = 10
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+
+# how many times store retries when an insert still hits the unique uid
+MAX_ATTEMPTS = 3
+
+_lock = Lock()
+_last_ms = 0
+_sequence = 0
+_worker_id = 0
+
+
+def _pick_worker_id():
+    # UID_WORKER_ID pins it, otherwise random per process, which is
+    # why the insert still retries on a unique violation
+    global _worker_id
+    worker_id = os.environ.get('UID_WORKER_ID')
+    if worker_id is not None:
+        _worker_id = int(worker_id) % (1 << WORKER_BITS)
+    else:
+        _worker_id = random.SystemRandom().getrandbits(WORKER_BITS)
+
+
+_pick_worker_id()
+# a forked worker must not keep its parent's worker id
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_pick_worker_id)
+
+
+def _encode(number):
+    chars = []
+    for _ in range(LENGTH):
+        number, remainder = divmod(number, 62)
+        chars.append(ALPHABET[remainder])
+    return ''.join(reversed(chars))
 
 
 def generate():
-    uid = str(uuid4())
-    uid = uid.replace('-', '')
-    uid = uid[:10]
-    snippet = db.query(Snippet).filter(Snippet.uid == uid).first()
-    if snippet:
-        return generate()
-    return uid
+    global _last_ms, _sequence
+
+    with _lock:
+        # never go back in time, even if the wall clock does
+        now = max(int(time.time() * 1000), _last_ms)
+        if now == _last_ms:
+            _sequence = (_sequence + 1) % (1 << SEQUENCE_BITS)
+            if _sequence == 0:
+                # sequence exhausted for this millisecond, wait for the next
+                while now <= _last_ms:
+                    now = int(time.time() * 1000)
+        else:
+            _sequence = 0
+        _last_ms = now
+
+        number = (
+            (now - EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS)
+            | _worker_id << SEQUENCE_BITS
+            | _sequence
+        )
+
+    return _encode(number)
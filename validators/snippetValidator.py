@@ -1,38 +1,34 @@
 from fastapi import Depends, HTTPException, Request, status
 
-from database import db
-from lib.data.languages import languages
-from lib.data.themes import themes
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, undefer
+
+from database import get_async_db
+from lib.registry import languages_by_ext, themes_by_value
 from models.Snippet import Snippet
 from models.User import User
 from schemas.SnippetSchema import createSnippetSchema, updateSnippetSchema
 from utils.helpers import tags_arr_to_str
 from middlewares import get_current_user, get_current_user2
 
-ext_list = [lang['ext'] for lang in languages]
-theme_list = [theme['value'] for theme in themes]
-
 
 def isOnlyAlphaNeumeric(string: str):
     return string.isalnum() and not string.isalpha() and not string.isnumeric()
 
 
-def validate_new_snippet(
-    request: Request,
-    snippet: createSnippetSchema,
-    user=Depends(get_current_user)
-):
+# the rules of a new snippet, shared by store and the bulk import
+def check_new_snippet(snippet: createSnippetSchema):
     snippet.title = snippet.title.strip()
     snippet.source_code = snippet.source_code.strip()
     snippet.language = snippet.language.strip()
 
-    if snippet.language not in ext_list:
+    if snippet.language not in languages_by_ext:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail='Invalid language'
         )
 
-    if snippet.theme not in theme_list:
+    if snippet.theme not in themes_by_value:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail='Invalid theme'
@@ -46,12 +42,25 @@ def validate_new_snippet(
     return snippet
 
 
-def validate_snippet(
+def validate_new_snippet(
+    request: Request,
+    snippet: createSnippetSchema,
+    user=Depends(get_current_user)
+):
+    return check_new_snippet(snippet)
+
+
+async def validate_snippet(
     request: Request,
     uid: str,
-    user=Depends(get_current_user2)
+    user=Depends(get_current_user2),
+    db=Depends(get_async_db)
 ):
-    snippet = db.query(Snippet).filter(Snippet.uid == uid).first()
+    snippet = await db.scalar(
+        select(Snippet)
+        .options(joinedload(Snippet.user), undefer(Snippet.source_code))
+        .where(Snippet.uid == uid)
+    )
     print(user)
     if snippet is None:
         raise HTTPException(
@@ -71,12 +80,17 @@ def validate_snippet(
         return snippet
 
 
-def validate_edit_snippet(
+async def validate_edit_snippet(
     request: Request,
     uid: str,
-    user=Depends(get_current_user)
+    user=Depends(get_current_user),
+    db=Depends(get_async_db)
 ):
-    snippet = db.query(Snippet).filter(Snippet.uid == uid).first()
+    snippet = await db.scalar(
+        select(Snippet)
+        .options(joinedload(Snippet.user), undefer(Snippet.source_code))
+        .where(Snippet.uid == uid)
+    )
 
     if snippet is None:
         raise HTTPException(
@@ -93,13 +107,16 @@ def validate_edit_snippet(
         )
 
 
-def validate_update_snippet(
+async def validate_update_snippet(
     request: Request,
     uid: str,
     update_snippet: updateSnippetSchema,
-    user=Depends(get_current_user)
+    user=Depends(get_current_user),
+    db=Depends(get_async_db)
 ):
-    existing_snippet = db.query(Snippet).filter(Snippet.uid == uid).first()
+    existing_snippet = await db.scalar(
+        select(Snippet).where(Snippet.uid == uid)
+    )
 
     if existing_snippet is None:
         raise HTTPException(
@@ -145,12 +162,15 @@ def validate_update_snippet(
     return update_snippet
 
 
-def validate_delete_snippet(
+async def validate_delete_snippet(
     request: Request,
     uid: str,
-    user=Depends(get_current_user)
+    user=Depends(get_current_user),
+    db=Depends(get_async_db)
 ):
-    existing_snippet = db.query(Snippet).filter(Snippet.uid == uid).first()
+    existing_snippet = await db.scalar(
+        select(Snippet).where(Snippet.uid == uid)
+    )
 
     if existing_snippet is None:
         raise HTTPException(
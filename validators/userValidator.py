@@ -1,20 +1,28 @@
-from fastapi import HTTPException, status
+from fastapi import Depends, HTTPException, status
 
-from database import db
+from sqlalchemy import select
+
+from database import get_async_db
 from models.User import User
 from schemas.UserSchema import createUserSchema
 
 
-def check_existing_user(user: createUserSchema):
-    existing_email = db.query(User).filter(User.email == user.email).first()
+async def check_existing_user(
+    user: createUserSchema,
+    db=Depends(get_async_db)
+):
+    existing_email = await db.scalar(
+        select(User).where(User.email == user.email)
+    )
     if existing_email:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail="Email already registered"
         )
 
-    existing_username = db.query(User).filter(
-        User.username == user.username).first()
+    existing_username = await db.scalar(
+        select(User).where(User.username == user.username)
+    )
     if existing_username:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,